@@ -0,0 +1,63 @@
+"""
+HeyHome 토큰 요청 payload 암호화 micro-benchmark.
+
+여러 농장이 동시에 토큰을 갱신할 때, 매번 AES256 객체를 만들고 암호화하는 기존 방식과
+자격 증명별 캐시(encrypt_credentials)를 사용하는 방식의 갱신 1회당 CPU 시간을 비교한다.
+
+backend 디렉터리에서 실행:
+    python -m benchmarks.bench_heyhome_payload --farms 500 --rounds 20
+"""
+import argparse
+import json
+import time
+
+from heyhome.heyhome_utility import AES256, build_credential_payload, encrypt_credentials
+from models import HeyhomeInfo
+
+
+def make_configs(farms: int):
+    return [
+        HeyhomeInfo(
+            client_id=f"client-{i:04d}",
+            client_secret=f"secret-{i:04d}" * 2,
+            app_key=f"app-key-{i:04d}-".ljust(44, "x"),
+            grant_type="password",
+            username=f"farm{i:04d}",
+            password=f"password-{i:04d}",
+        )
+        for i in range(farms)
+    ]
+
+
+def uncached(config: HeyhomeInfo) -> str:
+    return AES256(config.app_key).encrypt(json.dumps(build_credential_payload(config)))
+
+
+def measure(func, configs, rounds: int) -> float:
+    started = time.process_time()
+    for _ in range(rounds):
+        for config in configs:
+            func(config)
+    return (time.process_time() - started) / (rounds * len(configs))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--farms", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    configs = make_configs(args.farms)
+    for config in configs:
+        assert encrypt_credentials(config) == uncached(config)
+
+    before = measure(uncached, configs, args.rounds)
+    after = measure(encrypt_credentials, configs, args.rounds)
+    print(f"farms={args.farms} rounds={args.rounds}")
+    print(f"uncached : {before * 1e6:8.2f} us/refresh")
+    print(f"cached   : {after * 1e6:8.2f} us/refresh")
+    print(f"saved    : {(before - after) * 1e6:8.2f} us/refresh ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+로그인(bcrypt 검증) 처리량 benchmark.
+
+동시에 몰린 로그인 요청을 기존처럼 요청 스레드풀에서 bcrypt 검증하는 경우와
+user_password 의 프로세스 풀로 넘기는 경우를 비교한다. 처리량(logins/s)과 함께,
+그동안 event loop 가 다른 요청을 얼마나 늦게 처리하는지(최대 loop 지연)를 출력한다.
+
+backend 디렉터리에서 실행:
+    python -m benchmarks.bench_login --logins 64
+"""
+import argparse
+import asyncio
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from domain.user import user_password
+from domain.user.user_password import pwd_context
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(verify, password_hash: str, logins: int):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(verify("password", password_hash) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return logins / elapsed, await lag_task
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    args = parser.parse_args()
+
+    password_hash = pwd_context.hash("password")
+
+    async def threadpool_verify(password, hashed):
+        return await run_in_threadpool(pwd_context.verify, password, hashed)
+
+    # 프로세스 풀 기동 비용은 측정에서 제외
+    await user_password.verify_password("password", password_hash)
+
+    print(f"bcrypt rounds={user_password.BCRYPT_ROUNDS} logins={args.logins} "
+          f"workers={user_password.PASSWORD_HASH_WORKERS}")
+    for name, verify in (("threadpool", threadpool_verify), ("process pool", user_password.verify_password)):
+        throughput, lag = await run(verify, password_hash, args.logins)
+        print(f"{name:12s}: {throughput:7.1f} logins/s, max loop lag {lag * 1000:7.1f} ms")
+    user_password.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+질문/답변 조회의 sync(스레드풀) / async(AsyncSession) 처리량 benchmark.
+
+임시 SQLite 파일에 질문과 답변을 채운 뒤, 동시에 몰린 요청(목록 1페이지 + 질문 상세 + 답변 첫 페이지)을
+question_crud/answer_crud 의 같은 SELECT 로 Session 과 스레드풀에서 처리하는 경우와
+AsyncSession 으로 처리하는 경우를 비교한다.
+SQLite(aiosqlite) 에서는 async 쪽이 더 느리게 나온다 (README 참고).
+
+backend 디렉터리에서 실행:
+    python -m benchmarks.bench_qa_stack --questions 2000 --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from domain.answer import answer_crud
+from domain.question import question_crud, question_search
+from models import Answer, Base, Question, User
+
+
+def seed(engine, questions: int):
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        users = [User(username=f"user{i}", password="x", email=f"user{i}@example.com") for i in range(20)]
+        db.add_all(users)
+        now = datetime.now()
+        for i in range(questions):
+            question = Question(subject=f"question {i}", content="content " * 20,
+                                create_date=now - timedelta(minutes=i), user=users[i % 20])
+            question.answers = [Answer(content=f"answer {j}", create_date=now, user=users[j % 20])
+                                for j in range(i % 5)]
+            db.add(question)
+        db.commit()
+    question_search.ensure_search_index(engine)
+
+
+def sync_request(session_factory, question_id: int):
+    with session_factory() as db:
+        db.scalars(question_crud.question_page_stmt(select(Question), limit=10)).all()
+        db.scalar(question_crud.question_detail_stmt(question_id))
+        db.scalars(answer_crud.answer_list_stmt(question_id, answer_crud.ANSWER_PAGE_SIZE)).all()
+
+
+async def async_request(async_engine, question_id: int):
+    async with AsyncSession(bind=async_engine, expire_on_commit=False) as db:
+        (await db.scalars(question_crud.question_page_stmt(select(Question), limit=10))).all()
+        await db.scalar(question_crud.question_detail_stmt(question_id))
+        (await db.scalars(answer_crud.answer_list_stmt(question_id, answer_crud.ANSWER_PAGE_SIZE))).all()
+
+
+async def run(handle, question_ids, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(question_id):
+        async with semaphore:
+            await handle(question_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(question_id) for question_id in question_ids))
+    return len(question_ids) / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    seed(engine, args.questions)
+    session_factory = sessionmaker(bind=engine)
+
+    question_ids = [random.randint(1, args.questions) for _ in range(args.requests)]
+
+    async def sync_handle(question_id):
+        await run_in_threadpool(sync_request, session_factory, question_id)
+
+    async def async_handle(question_id):
+        await async_request(async_engine, question_id)
+
+    print(f"questions={args.questions} requests={args.requests} concurrency={args.concurrency}")
+    for name, handle in (("sync", sync_handle), ("async", async_handle)):
+        await run(handle, question_ids[:50], args.concurrency)  # warm up
+        throughput = await run(handle, question_ids, args.concurrency)
+        print(f"{name:5s}: {throughput:7.1f} requests/s")
+
+    await async_engine.dispose()
+    engine.dispose()
+    os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
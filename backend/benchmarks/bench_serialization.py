@@ -0,0 +1,110 @@
+"""
+대용량 목록 응답 직렬화 benchmark (1,000 항목당 시간).
+
+response_model 을 통한 기본 경로(재검증 + jsonable 변환 + json.dumps)와
+fast_json 경로(ORM 객체에서 한 번만 검증 후 pydantic 으로 바로 JSON 직렬화)를 비교한다.
+Tuya 장치 목록처럼 dict 로 만든 응답은 jsonable_encoder + json.dumps 와 orjson 을 비교한다.
+
+backend 디렉터리에서 실행 (FAST_JSON 설정과 무관하게 두 경로를 모두 측정):
+    python -m benchmarks.bench_serialization --items 1000 --rounds 20
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from starlette.responses import JSONResponse
+
+import fast_json
+from domain.answer.answer_schema import AnswerList
+from domain.question.question_schema import QuestionList
+
+
+def make_user(i: int):
+    return SimpleNamespace(id=i, username=f"user{i}", email=f"user{i}@example.com")
+
+
+def make_questions(items: int):
+    now = datetime.now()
+    return {
+        "total": items,
+        "next_cursor": None,
+        "question_list": [
+            SimpleNamespace(id=i, subject=f"question {i}", create_date=now, modify_date=None,
+                            user=make_user(i % 50), answer_count=i % 7, vote_count=i % 11)
+            for i in range(items)
+        ],
+    }
+
+
+def make_answers(items: int):
+    now = datetime.now()
+    return {
+        "next_cursor": None,
+        "answer_list": [
+            SimpleNamespace(id=i, content="answer " * 20, create_date=now, modify_date=None,
+                            question_id=1, user=make_user(i % 50), vote_count=3,
+                            voter=[make_user(j) for j in range(3)])
+            for i in range(items)
+        ],
+    }
+
+
+def make_devices(items: int):
+    return {
+        "success": True,
+        "page_size": items,
+        "total_devices": items,
+        "devices": [
+            {"id": f"device{i}", "name": f"sensor {i}", "isOnline": True, "productName": "8in1",
+             "model": "N/A", "ip": "10.0.0.1", "lat": "37.5", "lon": "127.0",
+             "activeTime": 1700000000, "updateTime": 1700000000, "uuid": f"uuid{i}", "category": "wsdcg"}
+            for i in range(items)
+        ],
+    }
+
+
+async def response_model_path(field, content) -> bytes:
+    serialized = await serialize_response(field=field, response_content=content)
+    return JSONResponse(serialized).body
+
+
+async def measure(func, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+        if asyncio.iscoroutine(result):
+            await result
+    return (time.perf_counter() - started) / rounds
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    fast_json.FAST_JSON = True
+    scale = 1000 / args.items * 1000  # ms per 1,000 items
+
+    print(f"items={args.items} rounds={args.rounds} orjson={'yes' if fast_json.orjson else 'no'}")
+    for name, schema, content in (("QuestionList", QuestionList, make_questions(args.items)),
+                                  ("AnswerList", AnswerList, make_answers(args.items))):
+        field = create_model_field(name=f"Response_{name}", type_=schema, mode="serialization")
+        before = await measure(lambda: response_model_path(field, content), args.rounds)
+        after = await measure(lambda: fast_json.model_response(schema, content).body, args.rounds)
+        print(f"{name:12s}: response_model {before * scale:7.2f} ms, fast {after * scale:7.2f} ms "
+              f"per 1,000 items ({before / after:.1f}x)")
+
+    devices = make_devices(args.items)
+    before = await measure(lambda: JSONResponse(jsonable_encoder(devices)).body, args.rounds)
+    after = await measure(lambda: fast_json.json_response(devices).body, args.rounds)
+    print(f"{'device_list':12s}: jsonable+json  {before * scale:7.2f} ms, fast {after * scale:7.2f} ms "
+          f"per 1,000 items ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
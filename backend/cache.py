@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    크기 제한(LRU)과 만료 시간(TTL)을 갖는 thread-safe 메모리 캐시.
+    sliding=True 이면 조회할 때마다 만료 시간이 연장되어 유휴 시간 기준으로 만료된다.
+    """
+    def __init__(self, maxsize: int, ttl: float, sliding: bool = False,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sliding = sliding
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        evicted = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            now = time.monotonic()
+            if expires_at <= now:
+                del self._entries[key]
+                evicted = value
+            else:
+                self._entries.move_to_end(key)
+                if self.sliding:
+                    self._entries[key] = (value, now + self.ttl)
+                return value
+        self._evicted(key, evicted)
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None and old[0] is not value:
+                evicted.append((key, old[0]))
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._pop_oldest())
+        for evicted_key, evicted_value in evicted:
+            self._evicted(evicted_key, evicted_value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self._evicted(key, entry[0])
+        return entry[0]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]):
+        """
+        predicate(key) 가 참인 항목을 모두 제거.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            evicted = [(key, self._entries.pop(key)[0]) for key in keys]
+        for key, value in evicted:
+            self._evicted(key, value)
+
+    def clear(self):
+        with self._lock:
+            evicted = [(key, entry[0]) for key, entry in self._entries.items()]
+            self._entries.clear()
+        for key, value in evicted:
+            self._evicted(key, value)
+
+    def _pop_oldest(self) -> tuple:
+        key, (value, _) = self._entries.popitem(last=False)
+        return key, value
+
+    def _evicted(self, key: Hashable, value: Any):
+        if self.on_evict is not None:
+            self.on_evict(key, value)
@@ -0,0 +1,23 @@
+import base64
+import json
+
+
+def pack_cursor(values: list) -> str:
+    """
+    Encode keyset values (JSON-serialisable) as an opaque url-safe cursor.
+    """
+    raw = json.dumps(values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def unpack_cursor(cursor: str) -> list:
+    """
+    Decode a cursor made by pack_cursor, or raise ValueError when it is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return values
@@ -1,47 +1,335 @@
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from starlette.config import Config
-
-config = Config('.env')
-SQLALCHEMY_DATABASE_URL = config('SQLALCHEMY_DATABASE_URL')
-
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base = declarative_base()
-naming_convention = {
-    "ix": 'ix_%(column_0_label)s',
-    "uq": "uq_%(table_name)s_%(column_0_name)s",
-    "ck": "ck_%(table_name)s_%(column_0_name)s",
-    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
-    "pk": "pk_%(table_name)s"
-}
-Base.metadata = MetaData(naming_convention=naming_convention)
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-# Async database
-SQLALCHEMY_DATABASE_URL_ASYNC = config('SQLALCHEMY_DATABASE_URL_ASYNC')
-async_engine = create_async_engine(SQLALCHEMY_DATABASE_URL_ASYNC)
-
-
-async def get_async_db():
-    db = AsyncSession(bind=async_engine)
-    try:
-        yield db
-    finally:
-        await db.close()
+import logging
+import math
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine, event, MetaData, Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.config import Config
+from starlette.requests import Request
+from starlette.responses import Response
+
+from db_instrumentation import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+config = Config('.env')
+SQLALCHEMY_DATABASE_URL = config('SQLALCHEMY_DATABASE_URL')
+
+# read replica (없으면 primary 사용)
+SQLALCHEMY_READ_DATABASE_URL = config('SQLALCHEMY_READ_DATABASE_URL', default='')
+SQLALCHEMY_READ_DATABASE_URL_ASYNC = config('SQLALCHEMY_READ_DATABASE_URL_ASYNC', default='')
+READ_YOUR_WRITES_SECONDS = config('READ_YOUR_WRITES_SECONDS', cast=float, default=5.0)
+REPLICA_RETRY_SECONDS = config('REPLICA_RETRY_SECONDS', cast=float, default=30.0)
+
+# connection pool
+DB_POOL_SIZE = config('DB_POOL_SIZE', cast=int, default=5)
+DB_MAX_OVERFLOW = config('DB_MAX_OVERFLOW', cast=int, default=10)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', cast=float, default=30.0)
+DB_POOL_RECYCLE = config('DB_POOL_RECYCLE', cast=int, default=1800)
+DB_POOL_PRE_PING = config('DB_POOL_PRE_PING', cast=bool, default=True)
+DB_POOL_SLOW_CHECKOUT_MS = config('DB_POOL_SLOW_CHECKOUT_MS', cast=float, default=100.0)
+
+# SQLite
+SQLITE_WAL = config('SQLITE_WAL', cast=bool, default=True)
+SQLITE_MMAP_SIZE = config('SQLITE_MMAP_SIZE', cast=int, default=256 * 1024 * 1024)
+SQLITE_BUSY_TIMEOUT_MS = config('SQLITE_BUSY_TIMEOUT_MS', cast=int, default=5000)
+
+
+class PoolMetrics:
+    """
+    connection pool 의 checkout 대기 시간과 포화도(사용 중 연결 / 최대 연결 수) 집계.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                if waited * 1000 >= DB_POOL_SLOW_CHECKOUT_MS:
+                    self.slow_checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        if timed_out:
+            logger.error("DB pool %s exhausted: checkout timed out after %.3fs (%s)",
+                         self.name, waited, self.pool.status() if self.pool else "")
+        elif waited * 1000 >= DB_POOL_SLOW_CHECKOUT_MS:
+            logger.warning("DB pool %s slow checkout: waited %.3fs (%s)",
+                           self.name, waited, self.pool.status() if self.pool else "")
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "slow_checkouts": self.slow_checkouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+            # max_overflow=-1 은 overflow 무제한: 최대 연결 수가 없으므로 capacity/saturation 을 내보내지 않는다
+            if pool._max_overflow >= 0:
+                capacity = pool.size() + pool._max_overflow
+                stats.update(
+                    capacity=capacity,
+                    saturation=pool.checkedout() / capacity if capacity else 0.0,
+                )
+        return stats
+
+
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def pool_stats() -> Dict[str, dict]:
+    """
+    Return a metrics snapshot of every engine pool, keyed by engine name.
+    """
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+
+
+def _timed_pool_class(base, metrics: PoolMetrics):
+    # pool.recreate() (engine.dispose) 는 self.__class__ 로 새 pool 을 만들므로 metrics 가 유지된다.
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                metrics.observe(time.perf_counter() - started, timed_out=True)
+                raise
+            metrics.observe(time.perf_counter() - started)
+            metrics.pool = self
+            return connection
+    return TimedPool
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    if SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _engine_options(url: str, name: str, pool_base) -> dict:
+    database_url = make_url(url)
+    options = {}
+    if database_url.get_backend_name() == "sqlite":
+        if database_url.get_driver_name() == "pysqlite":
+            options["connect_args"] = {"check_same_thread": False}
+        if database_url.database in (None, "", ":memory:"):
+            return options  # in-memory DB 는 SQLAlchemy 기본 pool 을 사용
+    metrics = pool_metrics[name] = PoolMetrics(name)
+    options.update(
+        poolclass=_timed_pool_class(pool_base, metrics),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return options
+
+
+def _configure(sync_engine, name: str):
+    metrics = pool_metrics.get(name)
+    if metrics is not None:
+        metrics.pool = sync_engine.pool
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    instrument_engine(sync_engine)
+
+
+def create_db_engine(url: str, name: str = "primary"):
+    """
+    Create a sync engine with pool settings from .env, SQLite pragmas, pool metrics
+    and per-request SQL instrumentation.
+    """
+    db_engine = create_engine(url, **_engine_options(url, name, QueuePool))
+    _configure(db_engine, name)
+    return db_engine
+
+
+def create_async_db_engine(url: str, name: str = "primary_async"):
+    """
+    create_db_engine for AsyncEngine.
+    """
+    db_engine = create_async_engine(url, **_engine_options(url, name, AsyncAdaptedQueuePool))
+    _configure(db_engine.sync_engine, name)
+    return db_engine
+
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base = declarative_base()
+naming_convention = {
+    "ix": 'ix_%(column_0_label)s',
+    "uq": "uq_%(table_name)s_%(column_0_name)s",
+    "ck": "ck_%(table_name)s_%(column_0_name)s",
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+    "pk": "pk_%(table_name)s"
+}
+Base.metadata = MetaData(naming_convention=naming_convention)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Read replica
+read_engine = create_db_engine(SQLALCHEMY_READ_DATABASE_URL, name="replica") \
+    if SQLALCHEMY_READ_DATABASE_URL else None
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# 쓰기에 성공한 클라이언트는 그 시각(cookie / 헤더)을 받아 다음 요청에 보내고,
+# READ_YOUR_WRITES_SECONDS 동안은 어느 worker 에서든 primary 에서 읽는다
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+_replica_down_until = 0.0
+
+
+def note_write(response: Response):
+    """
+    Mark the response of a successful write with the write time (cookie and header),
+    so the client's reads go to the primary for READ_YOUR_WRITES_SECONDS despite replica lag.
+    """
+    marker = f"{time.time():.3f}"
+    response.set_cookie(LAST_WRITE_COOKIE, marker, max_age=math.ceil(READ_YOUR_WRITES_SECONDS),
+                        httponly=True, samesite="lax")
+    response.headers[LAST_WRITE_HEADER] = marker
+
+
+def _wrote_recently(request: Request) -> bool:
+    marker = request.cookies.get(LAST_WRITE_COOKIE) or request.headers.get(LAST_WRITE_HEADER)
+    try:
+        return marker is not None and time.time() - float(marker) < READ_YOUR_WRITES_SECONDS
+    except ValueError:
+        return False
+
+
+def _read_from_replica(request: Request, replica) -> bool:
+    if replica is None or time.monotonic() < _replica_down_until:
+        return False
+    return not _wrote_recently(request)
+
+
+def on_replica(db) -> bool:
+    """
+    True when the (Async)Session from get_read_db / get_async_read_db reads from the replica.
+    """
+    return db.info.get("replica", False)
+
+
+def _replica_failed(e: Exception):
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+    logger.warning("Read replica unavailable, using primary for %.0fs: %s", REPLICA_RETRY_SECONDS, e)
+
+
+def get_read_db(request: Request):
+    """
+    get_db for read-only endpoints: a session on the read replica when configured,
+    falling back to the primary when the replica is down or the client wrote recently.
+    """
+    connection = None
+    if _read_from_replica(request, read_engine):
+        try:
+            connection = read_engine.connect()
+        except (DBAPIError, PoolTimeoutError) as e:
+            _replica_failed(e)
+    db = ReadSessionLocal(bind=connection) if connection is not None else SessionLocal()
+    db.info["replica"] = connection is not None
+    try:
+        yield db
+    finally:
+        db.close()
+        if connection is not None:
+            connection.close()
+
+
+def _insert_ignore_stmt(db, table: Table, values: dict):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(table).values(**values).on_conflict_do_nothing()
+
+
+def insert_ignore(db, table: Table, **values) -> bool:
+    """
+    INSERT ... ON CONFLICT DO NOTHING. Return True if a row was inserted.
+    """
+    result = db.execute(_insert_ignore_stmt(db, table, values))
+    return result.rowcount > 0
+
+
+# Async database
+SQLALCHEMY_DATABASE_URL_ASYNC = config('SQLALCHEMY_DATABASE_URL_ASYNC')
+async_engine = create_async_db_engine(SQLALCHEMY_DATABASE_URL_ASYNC)
+
+
+async def get_async_db():
+    db = AsyncSession(bind=async_engine, expire_on_commit=False)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+read_async_engine = create_async_db_engine(SQLALCHEMY_READ_DATABASE_URL_ASYNC, name="replica_async") \
+    if SQLALCHEMY_READ_DATABASE_URL_ASYNC else None
+
+
+async def get_async_read_db(request: Request):
+    """
+    get_read_db for AsyncSession.
+    """
+    connection = None
+    if _read_from_replica(request, read_async_engine):
+        try:
+            connection = await read_async_engine.connect()
+        except (DBAPIError, PoolTimeoutError) as e:
+            _replica_failed(e)
+    db = AsyncSession(bind=connection if connection is not None else async_engine, expire_on_commit=False)
+    db.info["replica"] = connection is not None
+    try:
+        yield db
+    finally:
+        await db.close()
+        if connection is not None:
+            await connection.close()
+
+
+async def async_insert_ignore(db: AsyncSession, table: Table, **values) -> bool:
+    """
+    insert_ignore for AsyncSession.
+    """
+    result = await db.execute(_insert_ignore_stmt(db, table, values))
+    return result.rowcount > 0
@@ -0,0 +1,131 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.config import Config
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+config = Config('.env')
+SQL_INSTRUMENTATION = config('SQL_INSTRUMENTATION', cast=bool, default=True)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', cast=float, default=200.0)
+N_PLUS_ONE_DETECTION = config('N_PLUS_ONE_DETECTION', cast=bool, default=False)  # 개발 환경용
+N_PLUS_ONE_THRESHOLD = config('N_PLUS_ONE_THRESHOLD', cast=int, default=5)
+
+
+class RequestSqlStats:
+    """
+    요청 하나에서 실행된 SQL 의 건수, 총 DB 시간, 가장 느린 statement.
+    """
+    def __init__(self, track_statements: bool = False):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.statements = Counter() if track_statements else None
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+        if self.statements is not None:
+            self.statements[statement] += 1
+
+    def repeated_statements(self, threshold: int):
+        if self.statements is None:
+            return []
+        return [(statement, count) for statement, count in self.statements.most_common()
+                if count >= threshold]
+
+
+_current: ContextVar[Optional[RequestSqlStats]] = ContextVar("request_sql_stats", default=None)
+
+
+def current_stats() -> Optional[RequestSqlStats]:
+    return _current.get()
+
+
+def _shorten(statement: str, length: int = 300) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= length else statement[:length] + "..."
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, _shorten(statement))
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    # 실패한 statement 의 시작 시각을 정리
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(sync_engine: Engine):
+    """
+    Attach the per-request SQL timing hooks to an engine (AsyncEngine: pass .sync_engine).
+    """
+    if not SQL_INSTRUMENTATION:
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class SqlInstrumentationMiddleware:
+    """
+    요청마다 SQL 통계를 모아 Server-Timing 헤더로 DB 시간을 내보내고,
+    N_PLUS_ONE_DETECTION 이 켜져 있으면 같은 statement 가 반복된 요청을 경고한다.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SQL_INSTRUMENTATION:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSqlStats(track_statements=N_PLUS_ONE_DETECTION)
+        token = _current.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing",
+                               f'db;dur={stats.total_seconds * 1000:.1f};desc="{stats.count} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self._report(scope, stats)
+
+    @staticmethod
+    def _report(scope, stats: RequestSqlStats):
+        path = f'{scope["method"]} {scope["path"]}'
+        for statement, count in stats.repeated_statements(N_PLUS_ONE_THRESHOLD):
+            logger.warning("Possible N+1 in %s: %d x %s", path, count, _shorten(statement))
+        if stats.count:
+            # 느린 쿼리가 있었던 요청은 경로와 함께 기본 로그 수준에서도 보이도록 WARNING
+            level = logging.WARNING if stats.slowest_seconds * 1000 >= SLOW_QUERY_MS else logging.DEBUG
+            logger.log(level, "%s: %d queries, %.1f ms in DB, slowest %.1f ms: %s", path, stats.count,
+                       stats.total_seconds * 1000, stats.slowest_seconds * 1000,
+                       _shorten(stats.slowest_statement or ""))
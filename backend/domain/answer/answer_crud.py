@@ -1,38 +1,133 @@
-from datetime import datetime
-
-from sqlalchemy.orm import Session
-
-from domain.answer.answer_schema import AnswerCreate, AnswerUpdate
-from models import Question, Answer, User
-
-
-def create_answer(db: Session, question: Question,
-                  answer_create: AnswerCreate, user: User):
-    db_answer = Answer(question=question,
-                       content=answer_create.content,
-                       create_date=datetime.now(),
-                       user=user)
-    db.add(db_answer)
-    db.commit()
-
-
-def get_answer(db: Session, answer_id: int):
-    return db.query(Answer).get(answer_id)
-
-
-def update_answer(db: Session, db_answer: Answer,
-                  answer_update: AnswerUpdate):
-    db_answer.content = answer_update.content
-    db_answer.modify_date = datetime.now()
-    db.add(db_answer)
-    db.commit()
-
-
-def delete_answer(db: Session, db_answer: Answer):
-    db.delete(db_answer)
-    db.commit()
-
-
-def vote_answer(db: Session, db_answer: Answer, db_user: User):
-    db_answer.voter.append(db_user)
-    db.commit()
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from starlette.config import Config
+
+from cursor import pack_cursor, unpack_cursor
+from database import async_insert_ignore
+from domain.answer.answer_schema import AnswerCreate, AnswerUpdate
+from domain.question import question_cache, question_count, question_search
+from models import Question, Answer, User, answer_voter
+
+config = Config('.env')
+ANSWER_PAGE_SIZE = config('ANSWER_PAGE_SIZE', cast=int, default=10)
+
+# 답변 목록 정렬: 최신순 (create_date desc, id desc) / 추천순 (vote_count desc, id desc)
+NEWEST = "newest"
+VOTES = "votes"
+_sort_columns = {NEWEST: Answer.create_date, VOTES: Answer.vote_count}
+
+
+def encode_answer_cursor(answer: Answer, sort: str) -> str:
+    value = answer.create_date.isoformat() if sort == NEWEST else answer.vote_count
+    return pack_cursor([value, answer.id])
+
+
+def decode_answer_cursor(cursor: str, sort: str):
+    """
+    Return the (sort value, id) of a cursor, or raise ValueError when it is malformed.
+    """
+    try:
+        value, answer_id = unpack_cursor(cursor)
+        value = datetime.fromisoformat(value) if sort == NEWEST else int(value)
+        return value, int(answer_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def answer_list_stmt(question_id: int, limit: int, sort: str = NEWEST, after: tuple = None):
+    """
+    question 의 답변 한 페이지(+1 행, 다음 페이지 유무 확인용)를 조회하는 keyset 페이징 SELECT.
+    """
+    column = _sort_columns[sort]
+    stmt = select(Answer) \
+        .options(selectinload(Answer.user), selectinload(Answer.voter)) \
+        .where(Answer.question_id == question_id) \
+        .order_by(column.desc(), Answer.id.desc())
+    if after:
+        value, answer_id = after
+        stmt = stmt.where(or_(column < value, and_(column == value, Answer.id < answer_id)))
+    return stmt.limit(limit + 1)
+
+
+def _answer_page(rows: list, limit: int, sort: str):
+    answers = rows[:limit]
+    next_cursor = encode_answer_cursor(answers[-1], sort) if answers and len(rows) > limit else None
+    return answers, next_cursor
+
+
+async def async_create_answer(db: AsyncSession, question: Question,
+                              answer_create: AnswerCreate, user: User):
+    db_answer = Answer(question_id=question.id,
+                       content=answer_create.content,
+                       create_date=datetime.now(),
+                       user_id=user.id)
+    db.add(db_answer)
+    await db.flush()
+    await db.run_sync(question_search.index_question, question.id)
+    await db.commit()
+    question_cache.invalidate_question(question.id)
+    question_count.search_changed()
+
+
+async def async_get_answer_list(db: AsyncSession, question_id: int, limit: int = ANSWER_PAGE_SIZE,
+                                sort: str = NEWEST, after: tuple = None):
+    rows = (await db.scalars(answer_list_stmt(question_id, limit, sort, after))).all()
+    return _answer_page(rows, limit, sort)  # (답변 목록, 다음 cursor)
+
+
+async def async_get_answer(db: AsyncSession, answer_id: int):
+    return await db.get(Answer, answer_id)
+
+
+async def async_get_answer_detail(db: AsyncSession, answer_id: int):
+    """
+    작성자와 추천인을 함께 조회 (직렬화 시 lazy load 방지).
+    """
+    return await db.scalar(select(Answer)
+                           .options(selectinload(Answer.user), selectinload(Answer.voter))
+                           .where(Answer.id == answer_id))
+
+
+async def async_get_answer_version(db: AsyncSession, answer_id: int):
+    """
+    상세 캐시의 version: (수정 시각, 추천 수). 답변이 없으면 None.
+    """
+    row = (await db.execute(select(Answer.modify_date, Answer.vote_count)
+                            .where(Answer.id == answer_id))).first()
+    return tuple(row) if row else None
+
+
+async def async_update_answer(db: AsyncSession, db_answer: Answer,
+                              answer_update: AnswerUpdate):
+    db_answer.content = answer_update.content
+    db_answer.modify_date = datetime.now()
+    await db.flush()
+    await db.run_sync(question_search.index_question, db_answer.question_id)
+    await db.commit()
+    question_cache.invalidate_question(db_answer.question_id)
+    question_cache.invalidate_answer(db_answer.id)
+    question_count.search_changed()
+
+
+async def async_delete_answer(db: AsyncSession, db_answer: Answer):
+    answer_id, question_id = db_answer.id, db_answer.question_id
+    await db.delete(db_answer)
+    await db.flush()
+    await db.run_sync(question_search.index_question, question_id)
+    await db.commit()
+    question_cache.invalidate_question(question_id)
+    question_cache.invalidate_answer(answer_id)
+    question_count.search_changed()
+
+
+async def async_vote_answer(db: AsyncSession, db_answer: Answer, db_user: User):
+    # 추천인 목록을 읽지 않고 추가. 이미 추천했으면 아무것도 하지 않는다.
+    if await async_insert_ignore(db, answer_voter, answer_id=db_answer.id, user_id=db_user.id):
+        await db.execute(update(Answer).where(Answer.id == db_answer.id)
+                         .values(vote_count=Answer.vote_count + 1))
+    await db.commit()
+    question_cache.invalidate_question(db_answer.question_id)
+    question_cache.invalidate_answer(db_answer.id)
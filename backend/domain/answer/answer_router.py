@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from database import get_db
+import fast_json
+from database import get_async_db, get_async_read_db, on_replica
 from domain.answer import answer_schema, answer_crud
-from domain.question import question_crud
-from domain.user.user_router import get_current_user
+from domain.question import question_crud, question_cache
+from domain.user.user_router import get_current_user_async
 from models import User
 
 router = APIRouter(
@@ -14,62 +17,95 @@ router = APIRouter(
 
 
 @router.post("/create/{question_id}", status_code=status.HTTP_204_NO_CONTENT)
-def answer_create(question_id: int,
-                  _answer_create: answer_schema.AnswerCreate,
-                  db: Session = Depends(get_db),
-                  current_user: User = Depends(get_current_user)):
+async def answer_create(question_id: int,
+                        _answer_create: answer_schema.AnswerCreate,
+                        db: AsyncSession = Depends(get_async_db),
+                        current_user: User = Depends(get_current_user_async)):
 
     # create answer
-    question = question_crud.get_question(db, question_id=question_id)
+    question = await question_crud.async_get_question(db, question_id=question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-    answer_crud.create_answer(db, question=question,
-                              answer_create=_answer_create,
-                              user=current_user)
+    await answer_crud.async_create_answer(db, question=question,
+                                          answer_create=_answer_create,
+                                          user=current_user)
+
+
+@router.get("/list/{question_id}", response_model=answer_schema.AnswerList)
+async def answer_list(question_id: int,
+                      size: int = Query(default=answer_crud.ANSWER_PAGE_SIZE, ge=1, le=100),
+                      sort: Literal["newest", "votes"] = answer_crud.NEWEST,
+                      cursor: Optional[str] = None,
+                      db: AsyncSession = Depends(get_async_read_db)):
+    after = None
+    if cursor:
+        try:
+            after = answer_crud.decode_answer_cursor(cursor, sort)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="잘못된 cursor 입니다.")
+    _answer_list, next_cursor = await answer_crud.async_get_answer_list(
+        db, question_id, limit=size, sort=sort, after=after)
+    return fast_json.model_response(answer_schema.AnswerList, {
+        'answer_list': _answer_list,
+        'next_cursor': next_cursor
+    })
 
 
 @router.get("/detail/{answer_id}", response_model=answer_schema.Answer)
-def answer_detail(answer_id: int, db: Session = Depends(get_db)):
-    answer = answer_crud.get_answer(db, answer_id=answer_id)
-    return answer
+async def answer_detail(answer_id: int, request: Request,
+                        db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        answer = await answer_crud.async_get_answer_detail(db, answer_id=answer_id)
+        if not answer:
+            return None
+        body = answer_schema.Answer.model_validate(answer).model_dump_json().encode()
+        return body, answer.modify_date or answer.create_date
+
+    version = await answer_crud.async_get_answer_version(db, answer_id)
+    cached = version and await question_cache.async_get_detail(
+        question_cache.ANSWER, answer_id, version, build, store=not on_replica(db))
+    if not cached:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="데이터를 찾을수 없습니다.")
+    return question_cache.detail_response(request, cached)
 
 
 @router.put("/update", status_code=status.HTTP_204_NO_CONTENT)
-def answer_update(_answer_update: answer_schema.AnswerUpdate,
-                  db: Session = Depends(get_db),
-                  current_user: User = Depends(get_current_user)):
-    db_answer = answer_crud.get_answer(db, answer_id=_answer_update.answer_id)
+async def answer_update(_answer_update: answer_schema.AnswerUpdate,
+                        db: AsyncSession = Depends(get_async_db),
+                        current_user: User = Depends(get_current_user_async)):
+    db_answer = await answer_crud.async_get_answer(db, answer_id=_answer_update.answer_id)
     if not db_answer:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="데이터를 찾을수 없습니다.")
-    if current_user.id != db_answer.user.id:
+    if current_user.id != db_answer.user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="삭제 권한이 없습니다.")
-    answer_crud.update_answer(db=db, db_answer=db_answer,
-                              answer_update=_answer_update)
+    await answer_crud.async_update_answer(db=db, db_answer=db_answer,
+                                          answer_update=_answer_update)
 
 
 @router.delete("/delete", status_code=status.HTTP_204_NO_CONTENT)
-def answer_delete(_answer_delete: answer_schema.AnswerDelete,
-                  db: Session = Depends(get_db),
-                  current_user: User = Depends(get_current_user)):
-    db_answer = answer_crud.get_answer(db, answer_id=_answer_delete.answer_id)
+async def answer_delete(_answer_delete: answer_schema.AnswerDelete,
+                        db: AsyncSession = Depends(get_async_db),
+                        current_user: User = Depends(get_current_user_async)):
+    db_answer = await answer_crud.async_get_answer(db, answer_id=_answer_delete.answer_id)
     if not db_answer:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="데이터를 찾을수 없습니다.")
-    if current_user.id != db_answer.user.id:
+    if current_user.id != db_answer.user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="삭제 권한이 없습니다.")
-    answer_crud.delete_answer(db=db, db_answer=db_answer)
+    await answer_crud.async_delete_answer(db=db, db_answer=db_answer)
 
 
 @router.post("/vote", status_code=status.HTTP_204_NO_CONTENT)
-def answer_vote(_answer_vote: answer_schema.AnswerVote,
-                db: Session = Depends(get_db),
-                current_user: User = Depends(get_current_user)):
-    db_answer = answer_crud.get_answer(db, answer_id=_answer_vote.answer_id)
+async def answer_vote(_answer_vote: answer_schema.AnswerVote,
+                      db: AsyncSession = Depends(get_async_db),
+                      current_user: User = Depends(get_current_user_async)):
+    db_answer = await answer_crud.async_get_answer(db, answer_id=_answer_vote.answer_id)
     if not db_answer:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="데이터를 찾을수 없습니다.")
-    answer_crud.vote_answer(db, db_answer=db_answer, db_user=current_user)
-
+    await answer_crud.async_vote_answer(db, db_answer=db_answer, db_user=current_user)
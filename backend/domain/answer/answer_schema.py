@@ -22,6 +22,7 @@ class Answer(BaseModel):
     question_id: int
     modify_date: Optional[datetime.datetime] = None  # 수정된 부분
     voter: List[User] = []
+    vote_count: int = 0
 
     class Config:
         # orm_mode = True
@@ -40,6 +41,11 @@ class Answer(BaseModel):
 #         orm_mode = True
 
 
+class AnswerList(BaseModel):
+    answer_list: List[Answer] = []
+    next_cursor: Optional[str] = None
+
+
 class AnswerUpdate(AnswerCreate):
     answer_id: int
 
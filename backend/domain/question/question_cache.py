@@ -0,0 +1,84 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Awaitable, Callable, Hashable, NamedTuple, Optional
+
+from starlette.config import Config
+from starlette.requests import Request
+from starlette.responses import Response
+
+from cache import TTLCache
+
+config = Config('.env')
+DETAIL_CACHE_SIZE = config('DETAIL_CACHE_SIZE', cast=int, default=1024)
+DETAIL_CACHE_TTL = config('DETAIL_CACHE_TTL', cast=float, default=60.0)
+
+QUESTION = "question"
+ANSWER = "answer"
+
+
+class CachedDetail(NamedTuple):
+    version: Hashable
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+# (QUESTION|ANSWER, id) -> 직렬화된 상세 응답과 그 version.
+# version(수정 시각, 추천 수, 답변 수 등)이 DB 의 현재 값과 같을 때만 사용하므로
+# 다른 worker 의 변경이나 replica 에서 읽은 이전 version 이 잘못 반환되지 않는다.
+# replica 에서 읽은 본문은 primary 보다 늦을 수 있으므로 캐시에 넣지 않는다 (store=False).
+# 같은 프로세스의 쓰기는 메모리 정리를 위해 즉시 무효화한다.
+_details = TTLCache(DETAIL_CACHE_SIZE, DETAIL_CACHE_TTL)
+
+
+async def async_get_detail(kind: str, entity_id: int, version: Hashable,
+                           build: Callable[[], Awaitable[Optional[tuple]]],
+                           store: bool = True) -> Optional[CachedDetail]:
+    """
+    Return the cached detail of `version`, or await build() -> (json bytes, last modified) and cache it.
+    build() returns None when the entity does not exist.
+    """
+    cached = _details.get((kind, entity_id))
+    if cached is None or cached.version != version:
+        cached = _store(kind, entity_id, version, await build(), store)
+    return cached
+
+
+def _store(kind: str, entity_id: int, version: Hashable, built: Optional[tuple],
+           store: bool) -> Optional[CachedDetail]:
+    if built is None:
+        return None
+    body, last_modified = built
+    cached = CachedDetail(version=version,
+                          body=body,
+                          etag='"{}"'.format(hashlib.sha1(body).hexdigest()),
+                          last_modified=last_modified.replace(microsecond=0))
+    if store:
+        _details.set((kind, entity_id), cached)
+    return cached
+
+
+def detail_response(request: Request, cached: CachedDetail) -> Response:
+    """
+    If-None-Match 가 일치하면 304, 아니면 캐시된 본문을 반환.
+    추천은 수정 시각을 바꾸지 않으므로 If-Modified-Since 로는 304 를 반환하지 않는다.
+    """
+    headers = {
+        "ETag": cached.etag,
+        "Last-Modified": format_datetime(cached.last_modified.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if cached.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def invalidate_question(question_id: int):
+    _details.pop((QUESTION, question_id))
+
+
+def invalidate_answer(answer_id: int):
+    _details.pop((ANSWER, answer_id))
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.config import Config
+
+from cache import TTLCache
+from models import Question
+
+config = Config('.env')
+QUESTION_TOTAL_TTL = config('QUESTION_TOTAL_TTL', cast=float, default=300.0)
+QUESTION_COUNT_CACHE_SIZE = config('QUESTION_COUNT_CACHE_SIZE', cast=int, default=512)
+QUESTION_COUNT_CACHE_TTL = config('QUESTION_COUNT_CACHE_TTL', cast=float, default=30.0)
+
+
+class QuestionTotal:
+    """
+    전체 질문 수 카운터. 처음 조회할 때 COUNT 로 채우고, 이후에는 create/delete 에서 증감한다.
+    다른 worker 프로세스의 변경을 반영하도록 ttl 마다 다시 COUNT 한다.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._total = None
+        self._loaded_at = 0.0
+
+    def cached(self):
+        """
+        Return the maintained total, or None when it must be (re)counted.
+        """
+        with self._lock:
+            if self._total is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._total
+            return None
+
+    def store(self, total: int):
+        with self._lock:
+            self._total = total
+            self._loaded_at = time.monotonic()
+
+    def add(self, delta: int):
+        with self._lock:
+            if self._total is not None:
+                self._total = max(0, self._total + delta)
+
+    def invalidate(self):
+        with self._lock:
+            self._total = None
+
+
+question_total = QuestionTotal(QUESTION_TOTAL_TTL)
+
+# keyword -> 검색 결과 건수
+_keyword_counts = TTLCache(QUESTION_COUNT_CACHE_SIZE, QUESTION_COUNT_CACHE_TTL)
+
+
+async def async_count_questions(db: AsyncSession, keyword: str, question_list: Select) -> int:
+    """
+    Return the total for the list page: the maintained counter without a keyword,
+    otherwise a short-lived cached COUNT of `question_list` (a select(Question) statement).
+    """
+    if not keyword:
+        total = question_total.cached()
+        if total is None:
+            total = await db.scalar(select(func.count()).select_from(Question))
+            question_total.store(total)
+        return total
+    total = _keyword_counts.get(keyword)
+    if total is None:
+        total = await db.scalar(select(func.count()).select_from(question_list.subquery()))
+        _keyword_counts.set(keyword, total)
+    return total
+
+
+def question_added():
+    question_total.add(1)
+    _keyword_counts.clear()
+
+
+def question_removed():
+    question_total.add(-1)
+    _keyword_counts.clear()
+
+
+def search_changed():
+    """
+    질문/답변 내용이 바뀌어 검색 결과가 달라질 수 있을 때 호출.
+    """
+    _keyword_counts.clear()
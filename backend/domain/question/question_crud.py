@@ -1,76 +1,158 @@
-from datetime import datetime
-
-from sqlalchemy import select
-
-from domain.question.question_schema import QuestionCreate, QuestionUpdate
-from models import Question, User, Answer
-from sqlalchemy.orm import Session
-
-
-def get_question_list(db: Session, skip: int = 0, limit: int = 10, keyword: str = ''):
-    question_list = db.query(Question)
-    if keyword:
-        search = '%%{}%%'.format(keyword)
-        sub_query = db.query(Answer.question_id, Answer.content, User.username) \
-            .outerjoin(User, Answer.user_id == User.id).subquery()
-        question_list = question_list \
-            .outerjoin(User) \
-            .outerjoin(sub_query, sub_query.c.question_id == Question.id) \
-            .filter(Question.subject.ilike(search) |  # 질문제목
-                    Question.content.ilike(search) |  # 질문내용
-                    User.username.ilike(search) |  # 질문작성자
-                    sub_query.c.content.ilike(search) |  # 답변내용
-                    sub_query.c.username.ilike(search)  # 답변작성자
-                    )
-    total = question_list.distinct().count()
-    question_list = question_list.order_by(Question.create_date.desc()) \
-        .offset(skip).limit(limit).distinct().all()
-    return total, question_list  # (전체 건수, 페이징 적용된 질문 목록)
-
-
-def get_question(db: Session, question_id: int):
-    question = db.query(Question).get(question_id)
-    return question
-
-
-def create_question(db: Session, question_create: QuestionCreate, user: User):
-    db_question = Question(subject=question_create.subject,
-                           content=question_create.content,
-                           create_date=datetime.now(),
-                           user=user)
-    db.add(db_question)
-    db.commit()
-
-
-def update_question(db: Session, db_question: Question, question_update: QuestionUpdate):
-    db_question.subject = question_update.subject
-    db_question.content = question_update.content
-    db_question.modify_date = datetime.now()
-    db.add(db_question)
-    db.commit()
-
-
-def delete_question(db: Session, db_question: Question):
-    db.delete(db_question)
-    db.commit()
-
-
-def vote_question(db: Session, db_question: Question, db_user: User):
-    db_question.voter.append(db_user)
-    db.commit()
-
-
-# async examples
-async def get_async_question_list(db: Session):
-    data = await db.execute(select(Question)
-                            .order_by(Question.create_date.desc())
-                            .limit(10))
-    return data.all()
-
-
-async def async_create_question(db: Session, question_create: QuestionCreate):
-    db_question = Question(subject=question_create.subject,
-                           content=question_create.content,
-                           create_date=datetime.now())
-    db.add(db_question)
-    await db.commit()
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, with_expression
+from sqlalchemy.orm.attributes import set_committed_value
+
+from cursor import pack_cursor, unpack_cursor
+from database import async_insert_ignore
+from domain.answer import answer_crud
+from domain.question import question_cache, question_count, question_search
+from domain.question.question_schema import QuestionCreate, QuestionUpdate
+from models import Question, Answer, User, question_voter
+
+# 목록의 질문별 답변 수 (상관 서브쿼리)
+answer_count = select(func.count(Answer.id)) \
+    .where(Answer.question_id == Question.id).correlate(Question).scalar_subquery()
+
+# 목록/상세 eager loading. async 에서는 lazy load 가 불가능하므로 직렬화에 필요한 관계를 모두 포함한다.
+list_options = (selectinload(Question.user),
+                with_expression(Question.answer_count, answer_count))
+# 상세의 답변은 첫 페이지(answer_page_size 개)만 answer_crud 로 따로 조회한다.
+detail_options = (selectinload(Question.user),
+                  selectinload(Question.voter),
+                  with_expression(Question.answer_count, answer_count))
+
+
+def encode_cursor(question: Question) -> str:
+    """
+    Opaque cursor pointing just after `question` in (create_date desc, id desc) order.
+    """
+    return pack_cursor([question.create_date.isoformat(), question.id])
+
+
+def decode_cursor(cursor: str):
+    """
+    Return (create_date, id) of a cursor, or raise ValueError when it is malformed.
+    """
+    try:
+        create_date, question_id = unpack_cursor(cursor)
+        return datetime.fromisoformat(create_date), int(question_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def keyset_after(create_date: datetime, question_id: int):
+    """
+    (create_date desc, id desc) 순서에서 (create_date, question_id) 다음 행들의 조건.
+    """
+    return or_(Question.create_date < create_date,
+               and_(Question.create_date == create_date, Question.id < question_id))
+
+
+def question_page_stmt(question_list, skip: int = 0, limit: int = 10, after: tuple = None):
+    """
+    질문 한 페이지(+1 행, 다음 페이지 유무 확인용)를 조회하는 SELECT.
+    after=(create_date, id) 가 주어지면 keyset 페이징, 아니면 기존 offset(skip) 페이징.
+    """
+    page_query = question_list.options(*list_options) \
+        .order_by(Question.create_date.desc(), Question.id.desc())
+    if after:
+        page_query = page_query.where(keyset_after(*after))
+    else:
+        page_query = page_query.offset(skip)
+    return page_query.limit(limit + 1)
+
+
+def question_detail_stmt(question_id: int):
+    """
+    상세 화면용. 작성자, 추천인을 함께 조회 (답변 첫 페이지는 answer_crud 로 따로 조회).
+    """
+    return select(Question).options(*detail_options).where(Question.id == question_id)
+
+
+async def async_get_question_list(db: AsyncSession, skip: int = 0, limit: int = 10, keyword: str = '',
+                                  after: tuple = None, with_total: bool = True):
+    question_list = select(Question)
+    if keyword:
+        # 질문제목, 질문내용, 질문작성자, 답변내용, 답변작성자를 담은 검색 인덱스에서 조회
+        question_list = question_list.where(
+            Question.id.in_(question_search.search_question_ids(db, keyword)))
+    total = await question_count.async_count_questions(db, keyword, question_list) if with_total else None
+    rows = (await db.scalars(question_page_stmt(question_list, skip, limit, after))).all()
+
+    question_list = rows[:limit]
+    next_cursor = encode_cursor(question_list[-1]) if question_list and len(rows) > limit else None
+    return total, question_list, next_cursor  # (전체 건수, 페이징 적용된 질문 목록, 다음 cursor)
+
+
+async def async_get_question(db: AsyncSession, question_id: int):
+    return await db.get(Question, question_id)
+
+
+async def async_get_question_detail(db: AsyncSession, question_id: int):
+    question = await db.scalar(question_detail_stmt(question_id))
+    if not question:
+        return None, None
+    answers, answer_cursor = await answer_crud.async_get_answer_list(
+        db, question_id, limit=answer_crud.ANSWER_PAGE_SIZE)
+    set_committed_value(question, "answers", answers)
+    return question, answer_cursor
+
+
+async def async_get_question_version(db: AsyncSession, question_id: int):
+    """
+    상세 캐시의 version: 질문의 (수정 시각, 추천 수)와 답변의 (수, 최대 id, 최대 수정 시각, 추천 합계).
+    질문이 없으면 None.
+    """
+    row = (await db.execute(
+        select(Question.modify_date, Question.vote_count,
+               func.count(Answer.id), func.max(Answer.id),
+               func.max(Answer.modify_date), func.sum(Answer.vote_count))
+        .outerjoin(Answer, Answer.question_id == Question.id)
+        .where(Question.id == question_id)
+        .group_by(Question.id)
+    )).first()
+    return tuple(row) if row else None
+
+
+async def async_create_question(db: AsyncSession, question_create: QuestionCreate, user: User):
+    db_question = Question(subject=question_create.subject,
+                           content=question_create.content,
+                           create_date=datetime.now(),
+                           user_id=user.id)
+    db.add(db_question)
+    await db.flush()
+    await db.run_sync(question_search.index_question, db_question.id)
+    await db.commit()
+    question_count.question_added()
+
+
+async def async_update_question(db: AsyncSession, db_question: Question, question_update: QuestionUpdate):
+    db_question.subject = question_update.subject
+    db_question.content = question_update.content
+    db_question.modify_date = datetime.now()
+    await db.flush()
+    await db.run_sync(question_search.index_question, db_question.id)
+    await db.commit()
+    question_cache.invalidate_question(db_question.id)
+    question_count.search_changed()
+
+
+async def async_delete_question(db: AsyncSession, db_question: Question):
+    question_id = db_question.id
+    await db.run_sync(question_search.remove_question, question_id)
+    await db.delete(db_question)
+    await db.commit()
+    question_cache.invalidate_question(question_id)
+    question_count.question_removed()
+
+
+async def async_vote_question(db: AsyncSession, db_question: Question, db_user: User):
+    # 추천인 목록을 읽지 않고 추가. 이미 추천했으면 아무것도 하지 않는다.
+    if await async_insert_ignore(db, question_voter, question_id=db_question.id, user_id=db_user.id):
+        await db.execute(update(Question).where(Question.id == db_question.id)
+                         .values(vote_count=Question.vote_count + 1))
+    await db.commit()
+    question_cache.invalidate_question(db_question.id)
@@ -1,90 +1,111 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from starlette import status
-
-from database import get_db, get_async_db
-from domain.question import question_schema, question_crud
-from domain.user.user_router import get_current_user
-from models import User
-
-router = APIRouter(
-    prefix="/api/question",
-)
-
-
-@router.get("/list", response_model=question_schema.QuestionList)
-def question_list(db: Session = Depends(get_db),
-                  page: int = 0, size: int = 10, keyword: str = ''):
-    total, _question_list = question_crud.get_question_list(
-        db, skip=page * size, limit=size, keyword=keyword)
-    return {
-        'total': total,
-        'question_list': _question_list
-    }
-
-
-@router.get("/detail/{question_id}", response_model=question_schema.Question)
-def question_detail(question_id: int, db: Session = Depends(get_db)):
-    question = question_crud.get_question(db, question_id=question_id)
-    return question
-
-
-@router.post("/create", status_code=status.HTTP_204_NO_CONTENT)
-def question_create(_question_create: question_schema.QuestionCreate,
-                    db: Session = Depends(get_db),
-                    current_user: User = Depends(get_current_user)):
-    question_crud.create_question(db=db, question_create=_question_create,
-                                  user=current_user)
-
-
-@router.put("/update", status_code=status.HTTP_204_NO_CONTENT)
-def question_update(_question_update: question_schema.QuestionUpdate,
-                    db: Session = Depends(get_db),
-                    current_user: User = Depends(get_current_user)):
-    db_question = question_crud.get_question(db, question_id=_question_update.question_id)
-    if not db_question:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="데이터를 찾을수 없습니다.")
-    if current_user.id != db_question.user.id:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="수정 권한이 없습니다.")
-    question_crud.update_question(db=db, db_question=db_question,
-                                  question_update=_question_update)
-
-
-@router.delete("/delete", status_code=status.HTTP_204_NO_CONTENT)
-def question_delete(_question_delete: question_schema.QuestionDelete,
-                    db: Session = Depends(get_db),
-                    current_user: User = Depends(get_current_user)):
-    db_question = question_crud.get_question(db, question_id=_question_delete.question_id)
-    if not db_question:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="데이터를 찾을수 없습니다.")
-    if current_user.id != db_question.user.id:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="삭제 권한이 없습니다.")
-    question_crud.delete_question(db=db, db_question=db_question)
-
-
-@router.post("/vote", status_code=status.HTTP_204_NO_CONTENT)
-def question_vote(_question_vote: question_schema.QuestionVote,
-                  db: Session = Depends(get_db),
-                  current_user: User = Depends(get_current_user)):
-    db_question = question_crud.get_question(db, question_id=_question_vote.question_id)
-    if not db_question:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="데이터를 찾을수 없습니다.")
-    question_crud.vote_question(db, db_question=db_question, db_user=current_user)
-
-
-# async examples
-@router.get("/async_list")
-async def async_question_list(db: Session = Depends(get_async_db)):
-    result = await question_crud.get_async_question_list(db)
-    return result
-
-
-@router.post("/async_create", status_code=status.HTTP_204_NO_CONTENT)
-async def async_question_create(_question_create: question_schema.QuestionCreate,
-                                db: Session = Depends(get_async_db)):
-    await question_crud.async_create_question(db, question_create=_question_create)
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+import fast_json
+from database import get_async_db, get_async_read_db, on_replica
+from domain.question import question_schema, question_crud, question_cache
+from domain.user.user_router import get_current_user_async
+from models import User
+
+router = APIRouter(
+    prefix="/api/question",
+)
+
+
+@router.get("/list", response_model=question_schema.QuestionList)
+async def question_list(db: AsyncSession = Depends(get_async_read_db),
+                        page: int = Query(default=0, ge=0), size: int = Query(default=10, ge=1, le=100),
+                        keyword: str = '',
+                        cursor: Optional[str] = None, with_total: Optional[bool] = None):
+    # cursor 를 사용하는 경우 전체 건수는 요청할 때만 계산
+    if with_total is None:
+        with_total = cursor is None
+    after = None
+    if cursor:
+        try:
+            after = question_crud.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="잘못된 cursor 입니다.")
+    total, _question_list, next_cursor = await question_crud.async_get_question_list(
+        db, skip=page * size, limit=size, keyword=keyword,
+        after=after, with_total=with_total)
+    return fast_json.model_response(question_schema.QuestionList, {
+        'total': total,
+        'question_list': _question_list,
+        'next_cursor': next_cursor
+    })
+
+
+@router.get("/detail/{question_id}", response_model=question_schema.Question)
+async def question_detail(question_id: int, request: Request,
+                          db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        question, answer_cursor = await question_crud.async_get_question_detail(db, question_id=question_id)
+        if not question:
+            return None
+        dates = [question.create_date, question.modify_date]
+        dates += [date for answer in question.answers for date in (answer.create_date, answer.modify_date)]
+        detail = question_schema.Question.model_validate(question)
+        detail.answer_cursor = answer_cursor
+        return detail.model_dump_json().encode(), max(date for date in dates if date)
+
+    # version 을 먼저 조회해 캐시가 현재 DB 상태와 같을 때만 사용
+    version = await question_crud.async_get_question_version(db, question_id)
+    cached = version and await question_cache.async_get_detail(
+        question_cache.QUESTION, question_id, version, build, store=not on_replica(db))
+    if not cached:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="데이터를 찾을수 없습니다.")
+    return question_cache.detail_response(request, cached)
+
+
+@router.post("/create", status_code=status.HTTP_204_NO_CONTENT)
+async def question_create(_question_create: question_schema.QuestionCreate,
+                          db: AsyncSession = Depends(get_async_db),
+                          current_user: User = Depends(get_current_user_async)):
+    await question_crud.async_create_question(db=db, question_create=_question_create,
+                                              user=current_user)
+
+
+@router.put("/update", status_code=status.HTTP_204_NO_CONTENT)
+async def question_update(_question_update: question_schema.QuestionUpdate,
+                          db: AsyncSession = Depends(get_async_db),
+                          current_user: User = Depends(get_current_user_async)):
+    db_question = await question_crud.async_get_question(db, question_id=_question_update.question_id)
+    if not db_question:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="데이터를 찾을수 없습니다.")
+    if current_user.id != db_question.user_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="수정 권한이 없습니다.")
+    await question_crud.async_update_question(db=db, db_question=db_question,
+                                              question_update=_question_update)
+
+
+@router.delete("/delete", status_code=status.HTTP_204_NO_CONTENT)
+async def question_delete(_question_delete: question_schema.QuestionDelete,
+                          db: AsyncSession = Depends(get_async_db),
+                          current_user: User = Depends(get_current_user_async)):
+    db_question = await question_crud.async_get_question(db, question_id=_question_delete.question_id)
+    if not db_question:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="데이터를 찾을수 없습니다.")
+    if current_user.id != db_question.user_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="삭제 권한이 없습니다.")
+    await question_crud.async_delete_question(db=db, db_question=db_question)
+
+
+@router.post("/vote", status_code=status.HTTP_204_NO_CONTENT)
+async def question_vote(_question_vote: question_schema.QuestionVote,
+                        db: AsyncSession = Depends(get_async_db),
+                        current_user: User = Depends(get_current_user_async)):
+    db_question = await question_crud.async_get_question(db, question_id=_question_vote.question_id)
+    if not db_question:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="데이터를 찾을수 없습니다.")
+    await question_crud.async_vote_question(db, db_question=db_question, db_user=current_user)
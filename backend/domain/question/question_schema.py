@@ -29,11 +29,30 @@ class Question(BaseModel):
     user: Optional[User] = None  # 수정된 부분
     modify_date: Optional[datetime.datetime] = None
     voter: List[User] = []
+    vote_count: int = 0
+    answer_count: int = 0  # 전체 답변 수 (answers 에는 첫 페이지만 담긴다)
+    answer_cursor: Optional[str] = None  # 나머지 답변은 /api/answer/list 에 이 cursor 로 조회
 
     class Config:
         # orm_mode = True
         from_attributes = True
 
+class QuestionSummary(BaseModel):
+    """
+    목록용 요약. 답변/추천인 목록 대신 건수만 담는다 (전체 내용은 /detail).
+    """
+    id: int
+    subject: str
+    create_date: datetime.datetime
+    user: Optional[User] = None
+    modify_date: Optional[datetime.datetime] = None
+    answer_count: int = 0
+    vote_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+
 class QuestionCreate(BaseModel):
     subject: str
     content: str
@@ -46,9 +65,10 @@ class QuestionCreate(BaseModel):
 
 
 class QuestionList(BaseModel):
-    total: int = 0
+    total: Optional[int] = 0  # with_total=false 이면 None
+    next_cursor: Optional[str] = None  # 다음 페이지 요청에 사용할 cursor (마지막 페이지면 None)
     # question_list: list[Question] = []
-    question_list: List[Question] = []  # Use List[Question], not list[Question]
+    question_list: List[QuestionSummary] = []  # Use List[...], not list[...]
 
 
 class QuestionUpdate(QuestionCreate):
@@ -0,0 +1,137 @@
+import logging
+import re
+
+from sqlalchemy import column, false, func, literal_column, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Question, Answer, User
+
+logger = logging.getLogger(__name__)
+
+# 질문 검색 인덱스. question 하나당 한 행이며, 질문/답변 내용과 작성자를 함께 담는다.
+# - SQLite: FTS5 (trigram tokenizer, 기존 ILIKE '%kw%' 와 같은 부분 문자열 검색)
+# - PostgreSQL: tsvector 컬럼 + GIN 인덱스
+SEARCH_TABLE = "question_search"
+SEARCH_COLUMNS = ("subject", "content", "username", "answer_content", "answer_username")
+
+_sqlite_search = table(SEARCH_TABLE, column("rowid"), *(column(name) for name in SEARCH_COLUMNS))
+_pg_search = table(SEARCH_TABLE, column("question_id"), column("document"), column("tsv"))
+_INDEX_LOCK_KEY = 0x5153  # ensure_search_index 의 PostgreSQL advisory lock key
+# Base.metadata 밖에서 만드는 객체: FTS5 가상 테이블과 shadow 테이블(question_search_data 등),
+# PostgreSQL 의 question_search 테이블과 GIN 인덱스
+_SEARCH_INDEX = f"ix_{SEARCH_TABLE}_tsv"
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    alembic autogenerate 의 include_object hook. 검색 인덱스 테이블을 drop 대상에서 제외한다.
+    migrations/env.py 의 context.configure(..., include_object=include_object) 에 지정.
+    """
+    if type_ == "table" and (name == SEARCH_TABLE or name.startswith(f"{SEARCH_TABLE}_")):
+        return False
+    if type_ == "index" and name == _SEARCH_INDEX:
+        return False
+    return True
+
+
+def ensure_search_index(bind: Engine):
+    """
+    Create the search index if needed and backfill it when it is empty.
+    The check and the backfill run in one transaction under a write lock, so workers
+    starting together on an existing database backfill it only once.
+    """
+    try:
+        with bind.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _INDEX_LOCK_KEY})
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                    "question_id INTEGER PRIMARY KEY REFERENCES question(id) ON DELETE CASCADE, "
+                    "document TEXT NOT NULL, "
+                    "tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', document)) STORED)"
+                ))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {_SEARCH_INDEX} ON {SEARCH_TABLE} USING GIN (tsv)"
+                ))
+            else:
+                # 다른 worker 의 backfill 이 끝날 때까지 쓰기 잠금을 기다린다 (busy_timeout)
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                    f"USING fts5({', '.join(SEARCH_COLUMNS)}, tokenize='trigram')"
+                ))
+            indexed = conn.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+            if not indexed:
+                with Session(bind=conn) as db:
+                    for (question_id,) in db.query(Question.id).all():
+                        index_question(db, question_id)
+            conn.commit()
+    except IntegrityError:
+        # 잠금 없이 동시에 채운 경우 (예: 다른 버전의 worker) - 이미 인덱스가 있다
+        logger.info("Search index was backfilled by another worker")
+
+
+def _build_fields(db: Session, question_id: int) -> dict:
+    subject, content, username = db.query(Question.subject, Question.content, User.username) \
+        .outerjoin(User, Question.user_id == User.id) \
+        .filter(Question.id == question_id).one()
+    answers = db.query(Answer.content, User.username) \
+        .outerjoin(User, Answer.user_id == User.id) \
+        .filter(Answer.question_id == question_id).all()
+    return {
+        "subject": subject,
+        "content": content,
+        "username": username or "",
+        "answer_content": "\n".join(answer_content for answer_content, _ in answers),
+        "answer_username": "\n".join(answer_username or "" for _, answer_username in answers),
+    }
+
+
+def index_question(db: Session, question_id: int):
+    """
+    (Re)build the search row of one question in the current transaction.
+    Call after flushing question/answer changes and before commit.
+    """
+    fields = _build_fields(db, question_id)
+    remove_question(db, question_id)
+    if db.get_bind().dialect.name == "postgresql":
+        document = "\n".join(fields[name] for name in SEARCH_COLUMNS)
+        db.execute(_pg_search.insert().values(question_id=question_id, document=document))
+    else:
+        db.execute(_sqlite_search.insert().values(rowid=question_id, **fields))
+
+
+def remove_question(db: Session, question_id: int):
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(_pg_search.delete().where(_pg_search.c.question_id == question_id))
+    else:
+        db.execute(_sqlite_search.delete().where(_sqlite_search.c.rowid == question_id))
+
+
+def search_question_ids(db: Session, keyword: str):
+    """
+    Return a SELECT of question ids matching the keyword, for use in Question.id.in_(...).
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        terms = [re.sub(r"[^\w]", "", term) for term in keyword.split()]
+        query = " & ".join(f"{term}:*" for term in terms if term)
+        if not query:
+            return select(_pg_search.c.question_id).where(false())
+        return select(_pg_search.c.question_id) \
+            .where(_pg_search.c.tsv.op("@@")(func.to_tsquery("simple", query)))
+
+    if len(keyword) >= 3:
+        # trigram 인덱스는 3글자 이상부터 사용 가능. 전체를 하나의 구문으로 검색 (부분 문자열 일치)
+        phrase = '"{}"'.format(keyword.replace('"', '""'))
+        return select(_sqlite_search.c.rowid) \
+            .where(literal_column(SEARCH_TABLE).op("MATCH")(phrase))
+    search = '%{}%'.format(keyword)
+    return select(_sqlite_search.c.rowid).where(
+        _sqlite_search.c.subject.like(search) |
+        _sqlite_search.c.content.like(search) |
+        _sqlite_search.c.username.like(search) |
+        _sqlite_search.c.answer_content.like(search) |
+        _sqlite_search.c.answer_username.like(search)
+    )
@@ -1,25 +1,105 @@
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from domain.user.user_schema import UserCreate
-from models import User
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def create_user(db: Session, user_create: UserCreate):
-    db_user = User(username=user_create.username,
-                   password=pwd_context.hash(user_create.password1),
-                   email=user_create.email)
-    db.add(db_user)
-    db.commit()
-
-
-def get_existing_user(db: Session, user_create: UserCreate):
-    return db.query(User).filter(
-        (User.username == user_create.username) |
-        (User.email == user_create.email)
-    ).first()
-
-
-def get_user(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from starlette.config import Config
+from cache import TTLCache
+from domain.user.user_password import pwd_context
+from domain.user.user_schema import UserCreate
+from models import User
+
+config = Config('.env')
+USER_CACHE_SIZE = config('USER_CACHE_SIZE', cast=int, default=1024)
+USER_CACHE_TTL = config('USER_CACHE_TTL', cast=float, default=300.0)
+
+# username -> 세션에서 분리된 User 스냅샷
+_user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+def create_user(db: Session, user_create: UserCreate, password_hash: str = None):
+    db_user = User(username=user_create.username,
+                   password=password_hash or pwd_context.hash(user_create.password1),
+                   email=user_create.email)
+    db.add(db_user)
+    db.commit()
+    invalidate_user(db_user.username)
+
+
+def update_password(db: Session, db_user: User, password_hash: str):
+    db_user.password = password_hash
+    db.commit()
+    invalidate_user(db_user.username)
+
+
+def get_existing_user(db: Session, user_create: UserCreate):
+    return db.query(User).filter(
+        (User.username == user_create.username) |
+        (User.email == user_create.email)
+    ).first()
+
+
+def get_user(db: Session, username: str):
+    return db.query(User).filter(User.username == username).first()
+
+
+def get_user_cached(db: Session, username: str):
+    """
+    get_user 와 같지만, 캐시된 사용자는 SELECT 없이 요청 세션에 merge 하여 반환.
+    """
+    cached = _user_cache.get(username)
+    if cached is not None:
+        return db.merge(cached, load=False)
+    user = get_user(db, username)
+    if user is not None:
+        _cache_user(user)
+    return user
+
+
+def _cache_user(user: User):
+    snapshot = User(id=user.id, username=user.username,
+                    password=user.password, email=user.email)
+    make_transient_to_detached(snapshot)
+    _user_cache.set(user.username, snapshot)
+
+
+def invalidate_user(username: str):
+    _user_cache.pop(username)
+
+
+# AsyncSession 버전
+async def async_create_user(db: AsyncSession, user_create: UserCreate, password_hash: str):
+    """
+    password_hash 는 user_password.hash_password 로 만든 값 (bcrypt 를 이벤트 루프에서 실행하지 않도록).
+    """
+    db_user = User(username=user_create.username,
+                   password=password_hash,
+                   email=user_create.email)
+    db.add(db_user)
+    await db.commit()
+    invalidate_user(user_create.username)
+
+
+async def async_update_password(db: AsyncSession, db_user: User, password_hash: str):
+    db_user.password = password_hash
+    await db.commit()
+    invalidate_user(db_user.username)
+
+
+async def async_get_existing_user(db: AsyncSession, user_create: UserCreate):
+    return await db.scalar(select(User).where(
+        (User.username == user_create.username) |
+        (User.email == user_create.email)
+    ).limit(1))
+
+
+async def async_get_user(db: AsyncSession, username: str):
+    return await db.scalar(select(User).where(User.username == username).limit(1))
+
+
+async def async_get_user_cached(db: AsyncSession, username: str):
+    cached = _user_cache.get(username)
+    if cached is not None:
+        return await db.merge(cached, load=False)
+    user = await async_get_user(db, username)
+    if user is not None:
+        _cache_user(user)
+    return user
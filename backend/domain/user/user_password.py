@@ -0,0 +1,80 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+from starlette.config import Config
+
+config = Config('.env')
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', cast=int, default=12)
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', cast=int, default=2)
+PASSWORD_HASH_MAX_CONCURRENCY = config('PASSWORD_HASH_MAX_CONCURRENCY', cast=int, default=16)
+
+# BCRYPT_ROUNDS 와 다른 cost 로 만든 해시는 needs_update 대상 -> 로그인 시 재해시 (cost 를 낮춘 경우 포함)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+# 실행 중 + 대기 중인 bcrypt 작업 수 제한. 로그인이 몰려도 다른 요청이 CPU 를 잃지 않도록 한다.
+_slots = asyncio.Semaphore(PASSWORD_HASH_MAX_CONCURRENCY)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # 스레드가 떠 있는 프로세스를 fork 하면 상속된 lock 때문에 멈출 수 있으므로
+        # 깨끗한 forkserver(없으면 spawn) 프로세스에서 worker 를 만든다
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                        mp_context=multiprocessing.get_context(method))
+    return _executor
+
+
+async def start():
+    """
+    Create the bcrypt process pool and start its workers at application startup,
+    so the first login does not pay for it.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, int) for _ in range(PASSWORD_HASH_WORKERS)))
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update_sync(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+async def hash_password(password: str) -> str:
+    """
+    Hash the password on the bcrypt process pool.
+    """
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), hash_password_sync, password)
+
+
+async def verify_password(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify the password on the bcrypt process pool.
+    Returns (verified, new_hash); new_hash is set when the stored hash uses outdated settings.
+    """
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), verify_and_update_sync, password, password_hash)
@@ -1,50 +1,66 @@
+import time
 from datetime import timedelta, datetime
 
 from fastapi import APIRouter, HTTPException
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette import status
 from starlette.config import Config
 
-from database import get_db
-from domain.user import user_crud, user_schema
-from domain.user.user_crud import pwd_context
+from cache import TTLCache
+from database import get_db, get_async_db
+from domain.user import user_crud, user_password, user_schema
 
 config = Config('.env')
 ACCESS_TOKEN_EXPIRE_MINUTES = int(config('ACCESS_TOKEN_EXPIRE_MINUTES'))
 SECRET_KEY = config('SECRET_KEY')
 ALGORITHM = "HS256"
+TOKEN_CACHE_SIZE = config('TOKEN_CACHE_SIZE', cast=int, default=4096)
+TOKEN_CACHE_TTL = config('TOKEN_CACHE_TTL', cast=float, default=300.0)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/user/login")
 
+# access token 문자열 -> 검증된 payload
+_token_cache = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
 router = APIRouter(
     prefix="/api/user",
 )
 
 
 @router.post("/create", status_code=status.HTTP_204_NO_CONTENT)
-def user_create(_user_create: user_schema.UserCreate, db: Session = Depends(get_db)):
-    user = user_crud.get_existing_user(db, user_create=_user_create)
+async def user_create(_user_create: user_schema.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    user = await user_crud.async_get_existing_user(db, user_create=_user_create)
     if user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT,
                             detail="이미 존재하는 사용자입니다.")
-    user_crud.create_user(db=db, user_create=_user_create)
+    password_hash = await user_password.hash_password(_user_create.password1)
+    await user_crud.async_create_user(db=db, user_create=_user_create,
+                                      password_hash=password_hash)
 
 
 @router.post("/login", response_model=user_schema.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(),
-                           db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(),
+                                 db: AsyncSession = Depends(get_async_db)):
 
-    # check user and password
-    user = user_crud.get_user(db, form_data.username)
-    if not user or not pwd_context.verify(form_data.password, user.password):
+    # check user and password (bcrypt 는 별도 프로세스 풀에서 실행)
+    user = await user_crud.async_get_user(db, form_data.username)
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await user_password.verify_password(form_data.password, user.password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # 해시 설정(cost)이 바뀌었으면 새 설정으로 재해시하여 저장
+    if new_hash:
+        await user_crud.async_update_password(db, user, new_hash)
+
     # make access token
     data = {
         "sub": user.username,
@@ -59,22 +75,54 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(),
     }
 
 
-def get_current_user(token: str = Depends(oauth2_scheme),
-                     db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
+def decode_access_token(token: str) -> dict:
+    """
+    Decode and verify the JWT, reusing the result for repeated tokens until they expire.
+    """
+    payload = _token_cache.get(token)
+    if payload is None:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        remaining = payload.get("exp", 0) - time.time()
+        if remaining > 0:
+            _token_cache.set(token, payload, ttl=min(TOKEN_CACHE_TTL, remaining))
+    return payload
+
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+def get_token_username(token: str) -> str:
+    try:
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    else:
-        user = user_crud.get_user(db, username=username)
-        if user is None:
-            raise credentials_exception
-        return user
+    return username
+
+
+def get_current_user(token: str = Depends(oauth2_scheme),
+                     db: Session = Depends(get_db)):
+    username = get_token_username(token)
+    user = user_crud.get_user_cached(db, username=username)
+    if user is None:
+        raise credentials_exception
+    return user
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme),
+                                 db: AsyncSession = Depends(get_async_db)):
+    """
+    get_current_user for AsyncSession endpoints. FastAPI shares the same
+    get_async_db session with the endpoint, so the user is attached to it.
+    """
+    username = get_token_username(token)
+    user = await user_crud.async_get_user_cached(db, username=username)
+    if user is None:
+        raise credentials_exception
+    return user
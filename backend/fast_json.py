@@ -0,0 +1,55 @@
+import logging
+from typing import Any, Type
+
+from fastapi.datastructures import Default
+from pydantic import BaseModel
+from starlette.config import Config
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # orjson 이 없으면 표준 json 으로 동작
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+config = Config('.env')
+FAST_JSON = config('FAST_JSON', cast=bool, default=False)
+
+if FAST_JSON and orjson is None:
+    logger.warning("FAST_JSON is enabled but orjson is not installed; using the standard json encoder")
+
+
+class OrjsonResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+_response_class = OrjsonResponse if orjson is not None else JSONResponse
+
+# FastAPI(default_response_class=...) 에 사용.
+# 꺼져 있으면 FastAPI 기본값(Default placeholder)을 그대로 넘겨 기본 동작을 유지한다.
+default_response_class = OrjsonResponse if FAST_JSON and orjson is not None else Default(JSONResponse)
+
+
+def json_response(content: Any):
+    """
+    Return already JSON-compatible content (dicts/lists of plain values) as a response,
+    skipping FastAPI's jsonable_encoder pass. Without FAST_JSON the content is returned as is.
+    """
+    if not FAST_JSON:
+        return content
+    return _response_class(content)
+
+
+def model_response(schema: Type[BaseModel], content: Any):
+    """
+    Serialise `content` (a `schema` instance, or a dict/ORM object to validate once) straight
+    to JSON with pydantic, skipping the response_model re-validation and jsonable_encoder.
+    Without FAST_JSON the content is returned as is for the normal response_model path.
+    """
+    if not FAST_JSON:
+        return content
+    if not isinstance(content, schema):
+        content = schema.model_validate(content, from_attributes=True)
+    return Response(content.model_dump_json(), media_type="application/json")
@@ -0,0 +1,80 @@
+import time
+from typing import Optional
+
+import aiohttp
+from starlette.config import Config
+
+import metrics
+
+config = Config('.env')
+HEYHOME_HTTP_LIMIT = config('HEYHOME_HTTP_LIMIT', cast=int, default=100)
+HEYHOME_HTTP_LIMIT_PER_HOST = config('HEYHOME_HTTP_LIMIT_PER_HOST', cast=int, default=10)
+HEYHOME_HTTP_KEEPALIVE_SECONDS = config('HEYHOME_HTTP_KEEPALIVE_SECONDS', cast=float, default=30.0)
+HEYHOME_CONNECT_TIMEOUT = config('HEYHOME_CONNECT_TIMEOUT', cast=float, default=5.0)
+HEYHOME_READ_TIMEOUT = config('HEYHOME_READ_TIMEOUT', cast=float, default=15.0)
+
+
+async def _on_request_start(session, context, params):
+    context.started = time.perf_counter()
+
+
+async def _on_request_end(session, context, params):
+    metrics.observe_upstream("heyhome", params.method, params.url.path,
+                             time.perf_counter() - context.started, params.response.status >= 400)
+
+
+async def _on_request_exception(session, context, params):
+    metrics.observe_upstream("heyhome", params.method, params.url.path,
+                             time.perf_counter() - context.started, True)
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    """
+    endpoint path 별 HeyHome 호출 latency / 오류를 metrics 에 기록.
+    """
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
+
+
+class HeyhomeHttpClient:
+    """
+    HeyHome API 호출에 공유하는 비동기 HTTP 클라이언트.
+    keep-alive 연결 풀, host 별 연결 수 제한, connect/read timeout 을 적용한다.
+    """
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=HEYHOME_HTTP_LIMIT,
+                    limit_per_host=HEYHOME_HTTP_LIMIT_PER_HOST,
+                    keepalive_timeout=HEYHOME_HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    connect=HEYHOME_CONNECT_TIMEOUT,
+                    sock_read=HEYHOME_READ_TIMEOUT,
+                ),
+                raise_for_status=True,
+                trace_configs=[_trace_config()],
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        """
+        Return the shared session, creating it lazily when the startup hook has not run.
+        """
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+
+heyhome_http = HeyhomeHttpClient()
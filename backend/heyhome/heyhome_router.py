@@ -11,7 +11,7 @@ from models import HeyhomeInfo, User
 from database import get_db
 from domain.user.user_router import get_current_user
 from heyhome.heyhome_schema import HeyhomeConfigRequest, HeyhomeConfigResponse, HeyhomeTokenResponse
-from heyhome.heyhome_utility import is_token_expired, request_new_token, save_token_to_db
+from heyhome.heyhome_utility import is_token_expired, request_new_token, save_token_to_db, invalidate_credentials
 
 # FastAPI 설정
 app = FastAPI(
@@ -98,6 +98,9 @@ async def update_config(
     if not heyhome_config:
         heyhome_config = HeyhomeInfo(user_id=current_user.id)
         db.add(heyhome_config)
+    else:
+        # 이전 자격 증명으로 만든 암호화 payload 캐시 제거
+        invalidate_credentials(heyhome_config)
 
     heyhome_config.client_id = config_data.client_id
     heyhome_config.client_secret = config_data.client_secret
@@ -113,7 +116,7 @@ async def update_config(
     # `/get_token` 동작 실행
     if is_token_expired(heyhome_config):
         # 새 토큰 요청 및 저장
-        token_data = request_new_token(heyhome_config)
+        token_data = await request_new_token(heyhome_config)
         save_token_to_db(heyhome_config, token_data, db)
         return {
             "message": "Configuration updated and new token issued.",
@@ -154,7 +157,7 @@ async def get_token(
         )
 
     if is_token_expired(heyhome_config):
-        token_data = request_new_token(heyhome_config)
+        token_data = await request_new_token(heyhome_config)
         save_token_to_db(heyhome_config, token_data, db)
         return HeyhomeTokenResponse(
             access_token=token_data["access_token"],
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 import base64
@@ -9,6 +10,8 @@ import json
 import os
 from datetime import datetime, timedelta
 from domain.user.user_router import get_current_user
+from json_store import get_store
+from heyhome.heyhome_http import HEYHOME_CONNECT_TIMEOUT, HEYHOME_READ_TIMEOUT
 from models import User
 
 # Define file paths (same folder as the script)
@@ -37,24 +40,12 @@ class AES256:
         return decrypted.decode('utf-8')
 
 # Utility functions
+# 파일 내용은 메모리에 캐시되고, 파일이 바뀌었을 때만 다시 읽는다 (json_store.JsonFileStore)
 def load_file(file_path):
-    if not os.path.exists(file_path):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"File not found: {file_path}"
-        )
-    try:
-        with open(file_path, 'r') as file:
-            return json.load(file)
-    except json.JSONDecodeError:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Invalid JSON format in {file_path}"
-        )
+    return get_store(file_path).load()
 
 def save_file(file_path, data):
-    with open(file_path, 'w') as file:
-        json.dump(data, file, indent=4)
+    get_store(file_path).save(data)
 
 def is_token_expired(token_data):
     expires_in = token_data.get("expires_in")
@@ -78,7 +69,13 @@ def get_auth_token(config):
     }
     encrypted_data = aes256.encrypt(json.dumps(json_data))
     token_url = f"{config['base_url']}/token"
-    response = requests.post(token_url, json={"data": encrypted_data})
+    # 토큰 갱신은 locked() 안에서 실행되므로 응답이 없는 서버가 잠금을 계속 붙잡지 않도록 timeout 지정
+    try:
+        response = requests.post(token_url, json={"data": encrypted_data}, timeout=(HEYHOME_CONNECT_TIMEOUT, HEYHOME_READ_TIMEOUT))
+    except requests.Timeout:
+        raise HTTPException(status_code=504, detail="Token request timed out.")
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Error fetching token: {str(e)}")
     if response.status_code == 200:
         token_data = response.json()
         token_data["issued_at"] = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
@@ -90,11 +87,17 @@ def get_auth_token(config):
         )
 
 def get_valid_token(config):
-    token_data = load_file(TOKEN_FILE_PATH) if os.path.exists(TOKEN_FILE_PATH) else None
+    token_store = get_store(TOKEN_FILE_PATH)
+    token_data = token_store.load() if token_store.exists() else None
     if token_data and not is_token_expired(token_data):
         return token_data
-    new_token_data = get_auth_token(config)
-    save_file(TOKEN_FILE_PATH, new_token_data)
+    with token_store.locked():
+        # 잠금을 기다리는 동안 다른 워커가 이미 갱신했을 수 있으므로 다시 확인
+        token_data = token_store.load() if token_store.exists() else None
+        if token_data and not is_token_expired(token_data):
+            return token_data
+        new_token_data = get_auth_token(config)
+        token_store.save(new_token_data)
     return new_token_data
 
 # FastAPI setup
@@ -127,7 +130,7 @@ async def get_token(
     Retrieve a valid token, either from the saved token file or by requesting a new one.
     """
     config = load_file(CONFIG_FILE_PATH)
-    token_data = get_valid_token(config)
+    token_data = await run_in_threadpool(get_valid_token, config)
     return JSONResponse(content=token_data)
 
 # Include the router in the application
@@ -1,13 +1,21 @@
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
+import asyncio
 import base64
+import hashlib
 import json
 from datetime import datetime, timedelta
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
+from starlette.config import Config
+import metrics
+from cache import TTLCache
 from models import HeyhomeInfo
-import requests
+from heyhome.heyhome_http import heyhome_http
+import aiohttp
 
+config = Config('.env')
+HEYHOME_CREDENTIAL_CACHE_SIZE = config('HEYHOME_CREDENTIAL_CACHE_SIZE', cast=int, default=1024)
 
 class AES256:
     """
@@ -15,14 +23,14 @@ class AES256:
     """
     def __init__(self, appKey: str):
         self.appKey = appKey
+        self.key = appKey[:32].encode("utf-8")
+        self.iv = appKey[:16].encode("utf-8")
 
     def encrypt(self, text: str) -> str:
         """
         입력된 텍스트를 AES256 방식으로 암호화 후 Base64로 인코딩하여 반환.
         """
-        key = self.appKey[:32].encode("utf-8")
-        iv = self.appKey[:16].encode("utf-8")
-        cipher = AES.new(key, AES.MODE_CBC, iv)
+        cipher = AES.new(self.key, AES.MODE_CBC, self.iv)
         encrypted = cipher.encrypt(pad(text.encode("utf-8"), AES.block_size))
         return base64.urlsafe_b64encode(encrypted).decode("utf-8")
 
@@ -30,14 +38,66 @@ class AES256:
         """
         암호화된 Base64 텍스트를 AES256 방식으로 복호화.
         """
-        key = self.appKey[:32].encode("utf-8")
-        iv = self.appKey[:16].encode("utf-8")
-        cipher = AES.new(key, AES.MODE_CBC, iv)
+        cipher = AES.new(self.key, AES.MODE_CBC, self.iv)
         decodedBytes = base64.urlsafe_b64decode(cipherText)
         decrypted = unpad(cipher.decrypt(decodedBytes), AES.block_size)
         return decrypted.decode("utf-8")
 
 
+# app_key 별 AES256 객체와 자격 증명별 암호화 payload 캐시.
+# 자격 증명이 바뀌면 fingerprint 가 달라지므로 이전 항목은 다시 쓰이지 않고, update_config 에서 제거된다.
+_ciphers = TTLCache(HEYHOME_CREDENTIAL_CACHE_SIZE, ttl=float("inf"))
+_encrypted_payloads = TTLCache(HEYHOME_CREDENTIAL_CACHE_SIZE, ttl=float("inf"))
+
+
+def build_credential_payload(config: HeyhomeInfo) -> dict:
+    return {
+        "client_id": config.client_id,
+        "client_secret": config.client_secret,
+        "grant_type": config.grant_type,
+        "username": config.username,
+        "password": config.password,
+    }
+
+
+def credential_fingerprint(config: HeyhomeInfo) -> str:
+    """
+    토큰 요청 payload 에 영향을 주는 필드들의 SHA-256 해시.
+    """
+    fields = (config.app_key, config.client_id, config.client_secret, config.grant_type,
+              config.username, config.password)
+    return hashlib.sha256("\0".join(field or "" for field in fields).encode("utf-8")).hexdigest()
+
+
+def get_cipher(app_key: str) -> AES256:
+    cipher = _ciphers.get(app_key)
+    if cipher is None:
+        cipher = AES256(app_key)
+        _ciphers.set(app_key, cipher)
+    return cipher
+
+
+def encrypt_credentials(config: HeyhomeInfo) -> str:
+    """
+    자격 증명 payload 를 암호화. 같은 자격 증명이면 캐시된 결과를 그대로 반환.
+    """
+    fingerprint = credential_fingerprint(config)
+    encrypted_data = _encrypted_payloads.get(fingerprint)
+    if encrypted_data is None:
+        encrypted_data = get_cipher(config.app_key).encrypt(json.dumps(build_credential_payload(config)))
+        _encrypted_payloads.set(fingerprint, encrypted_data)
+    return encrypted_data
+
+
+def invalidate_credentials(config: HeyhomeInfo):
+    """
+    변경 전 자격 증명의 캐시 항목을 제거.
+    """
+    _encrypted_payloads.pop(credential_fingerprint(config))
+    if config.app_key:
+        _ciphers.pop(config.app_key)
+
+
 def is_token_expired(heyhome_info: HeyhomeInfo) -> bool:
     """
     토큰의 만료 여부를 확인.
@@ -48,39 +108,40 @@ def is_token_expired(heyhome_info: HeyhomeInfo) -> bool:
     return datetime.now() >= expires_at
 
 
-def request_new_token(config: HeyhomeInfo) -> dict:
+async def request_new_token(config: HeyhomeInfo) -> dict:
     """
     HeyHome API를 사용해 새 토큰을 요청.
     """
-    aes256 = AES256(config.app_key)
-    request_data = {
-        "client_id": config.client_id,
-        "client_secret": config.client_secret,
-        "grant_type": config.grant_type,
-        "username": config.username,
-        "password": config.password,
-    }
-
     try:
-        encrypted_data = aes256.encrypt(json.dumps(request_data))
-        response = requests.post(f"{config.api_endpoint}/token", json={"data": encrypted_data})
-        response.raise_for_status()  # HTTP 에러를 예외로 처리
-        token_data = response.json()
+        encrypted_data = encrypt_credentials(config)
+        session = await heyhome_http.session()
+        # raise_for_status=True 세션이므로 HTTP 에러는 예외로 처리됨
+        async with session.post(f"{config.api_endpoint}/token", json={"data": encrypted_data}) as response:
+            token_data = await response.json(content_type=None)
         token_data["issued_at"] = datetime.now()
+        metrics.token_refreshes.inc("heyhome", "success")
         return token_data
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        metrics.token_refreshes.inc("heyhome", "error")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch token: {str(e)}"
         )
 
 
-def save_token_to_db(heyhome_info: HeyhomeInfo, token_data: dict, db: Session):
+def apply_token(heyhome_info: HeyhomeInfo, token_data: dict):
     """
-    발급된 토큰 정보를 데이터베이스에 저장.
+    발급된 토큰 정보를 HeyhomeInfo 에 반영 (commit 하지 않음).
     """
     heyhome_info.access_token = token_data["access_token"]
     heyhome_info.refresh_token = token_data["refresh_token"]
     heyhome_info.expires_in = token_data["expires_in"]
     heyhome_info.issued_at = token_data["issued_at"]
+
+
+def save_token_to_db(heyhome_info: HeyhomeInfo, token_data: dict, db: Session):
+    """
+    발급된 토큰 정보를 데이터베이스에 저장.
+    """
+    apply_token(heyhome_info, token_data)
     db.commit()
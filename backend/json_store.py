@@ -0,0 +1,121 @@
+import copy
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from fastapi import HTTPException
+from starlette import status
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 스레드 잠금만 사용
+    fcntl = None
+
+
+class JsonFileStore:
+    """
+    JSON 파일을 메모리에 캐시하고, 파일의 inode/mtime/size 가 바뀌었을 때만 다시 읽는 저장소.
+    쓰기는 임시 파일 + rename 으로 원자적으로 수행하고, `uvicorn --workers N` 환경에서도
+    안전하도록 lock 파일에 프로세스 간 배타 잠금(flock)을 건다.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._lock = threading.RLock()  # locked(): 갱신 같은 긴 작업 동안 유지
+        self._cache_lock = threading.Lock()  # 메모리 캐시 전용. locked() 를 기다리지 않는다
+        self._lock_depth = 0
+        self._lock_file = None
+        self._data = None
+        self._signature = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> dict:
+        """
+        Return a copy of the file contents, re-reading the file only when it changed on disk.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"File not found: {self.path}"
+            )
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._cache_lock:
+            if signature != self._signature:
+                self._data = self._read()
+                self._signature = signature
+            return copy.deepcopy(self._data)
+
+    def save(self, data: dict):
+        """
+        Atomically replace the file with `data` while holding the cross-process lock.
+        """
+        directory = os.path.dirname(self.path) or "."
+        with self.locked():
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.path)}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as file:
+                    json.dump(data, file, indent=4)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            stat = os.stat(self.path)
+            with self._cache_lock:
+                self._data = copy.deepcopy(data)
+                self._signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the thread and cross-process lock, e.g. to re-check and refresh a token exactly once.
+        Re-entrant within the same thread.
+        """
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_file = open(self.lock_path, "a")
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield self
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except json.JSONDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Invalid JSON format in {self.path}"
+            )
+
+
+_stores: Dict[str, JsonFileStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str) -> JsonFileStore:
+    """
+    Return the process-wide store for `path`.
+    """
+    path = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = JsonFileStore(path)
+        return store
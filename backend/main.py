@@ -1,55 +1,104 @@
-from fastapi import FastAPI
-from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import FileResponse
-from starlette.staticfiles import StaticFiles
-
-from domain.answer import answer_router
-from domain.question import question_router
-from domain.user import user_router
-from heyhome import heyhome_router
-from tuya import tuya_router
-
-app = FastAPI(
-    swagger_ui_parameters={"persistAuthorization": True} # 인증 유지 활성화
-    )
-
-@app.on_event("startup")
-async def startup():
-    print("Application is starting")
-
-@app.on_event("shutdown")
-async def shutdown():
-    print("Application is shutting down")
-
-origins = [
-    "http://127.0.0.1:5173",  # Svelte
-    "http://localhost:3000",  # React
-    "http://localhost:8000",  # Fastapi
-]
-
-# origins = [
-#     "http://eplab.hanyang.ac.kr:5173",  # Svelte
-#     "http://eplab.hanyang.ac.kr:3000",  # React
-#     "http://eplab.hanyang.ac.kr:8000",  # Fastapi
-# ]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-app.include_router(question_router.router)
-app.include_router(answer_router.router)
-app.include_router(user_router.router)
-app.include_router(heyhome_router.router)
-app.include_router(tuya_router.router)
-app.mount("/assets", StaticFiles(directory="../frontend/dist/assets"))
-
-
-@app.get("/")
-def index():
-    return FileResponse("../frontend/dist/index.html")
+from fastapi import FastAPI
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, PlainTextResponse
+from starlette.staticfiles import StaticFiles
+
+import database
+import db_instrumentation
+import fast_json
+import metrics
+import profiler
+from database import engine
+from domain.answer import answer_router
+from domain.question import question_router, question_search
+from domain.user import user_router, user_password
+from heyhome import heyhome_router
+from heyhome.heyhome_http import heyhome_http
+from token_scheduler import token_scheduler, TOKEN_REFRESH_ENABLED
+from tuya import tuya_router, tuya_ingest
+
+app = FastAPI(
+    swagger_ui_parameters={"persistAuthorization": True}, # 인증 유지 활성화
+    default_response_class=fast_json.default_response_class,
+    )
+
+if database.read_engine is not None or database.read_async_engine is not None:
+    @app.middleware("http")
+    async def read_your_writes(request, call_next):
+        # 쓰기에 성공한 클라이언트는 잠시 동안 read replica 대신 primary 에서 읽는다
+        response = await call_next(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            database.note_write(response)
+        return response
+
+# 요청별 SQL 건수/DB 시간 (Server-Timing 헤더), slow query 로그, N+1 감지
+app.add_middleware(db_instrumentation.SqlInstrumentationMiddleware)
+
+# route 별 latency histogram, router 별 in-flight gauge
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.HttpMetricsMiddleware)
+
+# PROFILE_TOKEN 을 X-Profile 헤더로 보낸 요청만 sampling profile
+if profiler.PROFILE_TOKEN:
+    app.add_middleware(profiler.ProfilerMiddleware)
+
+@app.on_event("startup")
+async def startup():
+    print("Application is starting")
+    question_search.ensure_search_index(engine)
+    await user_password.start()
+    await heyhome_http.start()
+    if tuya_ingest.TUYA_INGEST_ENABLED:
+        await tuya_ingest.ingestor.start()
+    if TOKEN_REFRESH_ENABLED:
+        await token_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    print("Application is shutting down")
+    if tuya_ingest.TUYA_INGEST_ENABLED:
+        await tuya_ingest.ingestor.stop()
+    await token_scheduler.stop()
+    await heyhome_http.close()
+    user_password.shutdown()
+
+origins = [
+    "http://127.0.0.1:5173",  # Svelte
+    "http://localhost:3000",  # React
+    "http://localhost:8000",  # Fastapi
+]
+
+# origins = [
+#     "http://eplab.hanyang.ac.kr:5173",  # Svelte
+#     "http://eplab.hanyang.ac.kr:3000",  # React
+#     "http://eplab.hanyang.ac.kr:8000",  # Fastapi
+# ]
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+app.include_router(question_router.router)
+app.include_router(answer_router.router)
+app.include_router(user_router.router)
+app.include_router(heyhome_router.router)
+app.include_router(tuya_router.router)
+
+app.mount("/assets", StaticFiles(directory="../frontend/dist/assets"))
+
+
+@app.get("/")
+def index():
+    return FileResponse("../frontend/dist/index.html")
+
+
+if metrics.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint():
+        # Prometheus text exposition format
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
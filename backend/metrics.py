@@ -0,0 +1,237 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from starlette.config import Config
+
+import database
+
+config = Config('.env')
+METRICS_ENABLED = config('METRICS_ENABLED', cast=bool, default=True)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shards:
+    """
+    스레드마다 자기 dict 에만 쓰고, 수집할 때 모든 shard 를 합친다.
+    기록 경로에는 lock 이 없고, lock 은 스레드의 첫 기록과 수집 때만 잡는다.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[dict] = []
+
+    def shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def snapshots(self) -> List[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() 는 GIL 아래에서 한 번에 실행되므로 다른 스레드의 기록과 섞이지 않는다
+        return [shard.copy() for shard in shards]
+
+
+class Counter:
+    """
+    단조 증가 counter. Gauge 로 쓸 때는 음수 amount 로 감소시킨다.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._shards = _Shards()
+        _registry.append(self)
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shards.shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[tuple, float]:
+        totals = {}
+        for shard in self._shards.snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._shards = _Shards()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shards.shard()
+        # [bucket 별 개수 ..., +Inf 개수, 합계]
+        entry = shard.get(labels)
+        if entry is None:
+            entry = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def render(self) -> List[str]:
+        totals = {}
+        for shard in self._shards.snapshots():
+            for labels, entry in shard.items():
+                entry = list(entry)
+                total = totals.get(labels)
+                totals[labels] = entry if total is None else [a + b for a, b in zip(total, entry)]
+        lines = []
+        for labels, entry in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(entry[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+_registry: list = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route", "status"))
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled, by router.", ("router",))
+upstream_request_duration = Histogram(
+    "upstream_request_duration_seconds", "Outbound Tuya/HeyHome call latency.",
+    ("provider", "method", "endpoint"))
+upstream_request_errors = Counter(
+    "upstream_request_errors_total", "Outbound Tuya/HeyHome calls that failed or returned HTTP >= 400.",
+    ("provider", "method", "endpoint"))
+token_refreshes = Counter(
+    "token_refreshes_total", "Tuya/HeyHome token requests by result.", ("provider", "result"))
+
+# (metric 이름, snapshot key, 종류) - database.pool_stats() 를 그대로 노출
+_POOL_METRICS = (
+    ("db_pool_checkouts_total", "checkouts", "counter"),
+    ("db_pool_timeouts_total", "timeouts", "counter"),
+    ("db_pool_slow_checkouts_total", "slow_checkouts", "counter"),
+    ("db_pool_wait_seconds_total", "wait_seconds_total", "counter"),
+    ("db_pool_wait_seconds_max", "wait_seconds_max", "gauge"),
+    ("db_pool_size", "size", "gauge"),
+    ("db_pool_checked_out", "checked_out", "gauge"),
+    ("db_pool_overflow", "overflow", "gauge"),
+    ("db_pool_capacity", "capacity", "gauge"),
+    ("db_pool_saturation", "saturation", "gauge"),
+)
+
+# 경로의 id 부분(숫자, 긴 device id 등)은 label 수가 늘지 않도록 {id} 로 바꾼다
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[0-9A-Za-z_-]{8,}$|^\d+$")
+
+
+def endpoint_label(path: str) -> str:
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment
+                    for segment in path.split("?", 1)[0].split("/"))
+
+
+def observe_upstream(provider: str, method: str, path: str, seconds: float, failed: bool):
+    endpoint = endpoint_label(path)
+    upstream_request_duration.observe(seconds, provider, method, endpoint)
+    if failed:
+        upstream_request_errors.inc(provider, method, endpoint)
+
+
+ROUTERS = frozenset(("question", "answer", "user", "tuya", "heyhome"))
+
+
+def _router(path: str) -> str:
+    # /api/<router>/... -> router. 알 수 없는 경로는 label 이 늘지 않도록 "other"
+    parts = path.split("/", 3)
+    if len(parts) > 2 and parts[1] == "api" and parts[2] in ROUTERS:
+        return parts[2]
+    return "other"
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    stats = database.pool_stats()
+    for name, key, kind in _POOL_METRICS:
+        lines.append(f"# TYPE {name} {kind}")
+        for pool, snapshot in sorted(stats.items()):
+            value = snapshot.get(key)
+            if value is not None:
+                lines.append(f'{name}{{pool="{_escape(pool)}"}} {_number(value)}')
+    return "\n".join(lines) + "\n"
+
+
+class HttpMetricsMiddleware:
+    """
+    route template 별 latency histogram 과 router 별 in-flight gauge 를 기록.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        router = _router(scope["path"])
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(router)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec(router)
+            route = scope.get("route")
+            http_request_duration.observe(time.perf_counter() - started, scope["method"],
+                                          getattr(route, "path", "unmatched"), str(status_code))
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Table, Index, UniqueConstraint
+from sqlalchemy.orm import query_expression, relationship
 
 from database import Base
 
@@ -29,6 +29,14 @@ class Question(Base):
     user = relationship("User", backref="question_users")
     modify_date = Column(DateTime, nullable=True)
     voter = relationship('User', secondary=question_voter, backref='question_voters')
+    vote_count = Column(Integer, nullable=False, default=0, server_default="0")  # question_voter 행 수
+    # 목록 조회 시 with_expression 으로 채우는 집계 값
+    answer_count = query_expression()
+
+    __table_args__ = (
+        # 목록 keyset 페이징 (create_date desc, id desc)
+        Index("ix_question_create_date_id", "create_date", "id"),
+    )
 
 
 class Answer(Base):
@@ -43,6 +51,12 @@ class Answer(Base):
     user = relationship("User", backref="answer_users")
     modify_date = Column(DateTime, nullable=True)
     voter = relationship('User', secondary=answer_voter, backref='answer_voters')
+    vote_count = Column(Integer, nullable=False, default=0, server_default="0")  # answer_voter 행 수
+
+    __table_args__ = (
+        # 질문별 답변 keyset 페이징 (최신순)
+        Index("ix_answer_question_id_create_date", "question_id", "create_date"),
+    )
 
 
 class User(Base):
@@ -75,6 +89,7 @@ class Tuya8in1(Base):
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=True)
+    device_id = Column(String, nullable=True)
     create_date = Column(DateTime, nullable=True)
     temp_current = Column(Integer, nullable=True)
     ph_current = Column(Integer, nullable=True)
@@ -86,6 +101,30 @@ class Tuya8in1(Base):
     rf_current = Column(Integer, nullable=True)
     t = Column(Integer, nullable=True)
 
+    __table_args__ = (
+        Index("ix_tuya_8in1_device_id_create_date", "device_id", "create_date"),
+    )
+
+class Tuya8in1Rollup(Base):
+    __tablename__ = "tuya_8in1_rollup"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=True)
+    device_id = Column(String, nullable=False)
+    metric = Column(String, nullable=False)
+    granularity = Column(String, nullable=False)  # minute, hour, day
+    bucket_start = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+    mean_value = Column(Float, nullable=True)
+    last_value = Column(Float, nullable=True)
+    last_date = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("device_id", "metric", "granularity", "bucket_start"),
+    )
+
 class HeyhomeInfo(Base):
     __tablename__ = "heyhome_info"
 
@@ -107,5 +146,10 @@ class HeyhomeInfo(Base):
     issued_at = Column(DateTime, nullable=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=True)
 
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_lease"
 
-
+    # 여러 worker 중 lease 를 가진 하나만 백그라운드 작업(토큰 갱신 등)을 실행
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
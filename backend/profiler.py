@@ -0,0 +1,216 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from starlette.config import Config
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+config = Config('.env')
+PROFILE_TOKEN = config('PROFILE_TOKEN', default="")  # 비어 있으면 profiler 비활성
+PROFILE_INTERVAL_MS = config('PROFILE_INTERVAL_MS', cast=float, default=5.0)
+PROFILE_MAX_SECONDS = config('PROFILE_MAX_SECONDS', cast=float, default=30.0)
+PROFILE_DIR = config('PROFILE_DIR', default="")  # 지정하면 응답 대신 파일로 저장
+
+PROFILE_HEADER = "x-profile"
+FORMAT_QUERY = "__profile_format"
+COLLAPSED = "collapsed"
+SPEEDSCOPE = "speedscope"
+
+# 대기 중인 스레드(이벤트 루프의 select, 스레드풀 worker 의 queue 대기)의 stack 은 제외
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class StackSampler(threading.Thread):
+    """
+    interval 마다 sys._current_frames() 로 모든 스레드의 stack 을 읽어 횟수를 센다.
+    한 프로세스를 여러 요청이 같이 쓰므로, 동시에 처리 중인 다른 요청의 stack 도 섞일 수 있다.
+    """
+    def __init__(self, interval: float, max_seconds: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples = Counter()  # (thread name, ((function, file, line), ...)) -> count
+        self.started_at = None
+        self.duration = 0.0
+        self._stopped = threading.Event()
+
+    def run(self):
+        self.started_at = time.perf_counter()
+        deadline = self.started_at + self.max_seconds
+        while not self._stopped.wait(self.interval) and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = _stack(frame)
+                if stack:
+                    self.samples[(names.get(thread_id, str(thread_id)), stack)] += 1
+        self.duration = time.perf_counter() - self.started_at
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _stack(frame) -> tuple:
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+        return ()
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def collapsed(sampler: StackSampler) -> str:
+    """
+    Brendan Gregg 의 collapsed stack 형식 (flamegraph.pl, speedscope 에서 열 수 있음).
+    """
+    lines = []
+    for (thread_name, stack), count in sampler.samples.most_common():
+        frames = ";".join(f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack)
+        lines.append(f"{thread_name};{frames} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def speedscope(sampler: StackSampler, name: str) -> dict:
+    """
+    speedscope 의 sampled profile 형식. 스레드마다 profile 하나.
+    """
+    frames, frame_index, profiles = [], {}, {}
+    for (thread_name, stack), count in sampler.samples.items():
+        indexes = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            indexes.append(frame_index[frame])
+        profile = profiles.setdefault(thread_name, {
+            "type": "sampled", "name": thread_name, "unit": "seconds",
+            "startValue": 0, "endValue": 0, "samples": [], "weights": [],
+        })
+        profile["samples"].append(indexes)
+        profile["weights"].append(count * sampler.interval)
+        profile["endValue"] += count * sampler.interval
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "plasmafarm profiler",
+        "shared": {"frames": frames},
+        "profiles": list(profiles.values()),
+    }
+
+
+class ProfilerMiddleware:
+    """
+    X-Profile 헤더 값이 PROFILE_TOKEN 과 같은 요청만 sampling profile 한다.
+    PROFILE_DIR 이 없으면 응답 본문을 profile 로 바꿔 반환하고 (원래 status 는 X-Profile-Status),
+    있으면 파일로 저장하고 원래 응답에 X-Profile-File 헤더를 붙인다.
+    형식은 ?__profile_format=collapsed|speedscope (기본 speedscope).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILE_TOKEN:
+            await self.app(scope, receive, send)
+            return
+        # token 은 헤더로만 받는다 (query string 은 access log, proxy log 에 남는다)
+        token = dict(scope["headers"]).get(PROFILE_HEADER.encode(), b"").decode("latin-1")
+        if not token or not hmac.compare_digest(token, PROFILE_TOKEN):
+            await self.app(scope, receive, send)
+            return
+
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        output_format = query.get(FORMAT_QUERY, [SPEEDSCOPE])[0]
+        if output_format not in (COLLAPSED, SPEEDSCOPE):
+            output_format = SPEEDSCOPE
+        name = f'{scope["method"]} {scope["path"]}'
+        sampler = StackSampler(PROFILE_INTERVAL_MS / 1000, PROFILE_MAX_SECONDS)
+
+        if PROFILE_DIR:
+            path = self._path(scope, output_format)
+
+            async def send_with_path(message):
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("X-Profile-File", path)
+                await send(message)
+
+            sampler.start()
+            try:
+                await self.app(scope, receive, send_with_path)
+            finally:
+                # join, 직렬화와 파일 쓰기가 이벤트 루프를 막지 않도록 스레드에서 실행
+                await asyncio.to_thread(self._finish, sampler, name, output_format, path)
+            return
+
+        status_code = 500
+
+        async def discard(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            body = await asyncio.to_thread(self._finish, sampler, name, output_format)
+        media_type = "text/plain" if output_format == COLLAPSED else "application/json"
+        response = Response(body, media_type=media_type,
+                            headers={"X-Profile-Status": str(status_code)})
+        await response(scope, receive, send)
+
+    @classmethod
+    def _finish(cls, sampler: StackSampler, name: str, output_format: str, path: str = None) -> str:
+        """
+        Stop the sampler and render the profile; save it to `path` when given.
+        """
+        sampler.stop()
+        body = cls._render(sampler, name, output_format)
+        if path:
+            cls._save(path, body)
+        return body
+
+    @staticmethod
+    def _render(sampler: StackSampler, name: str, output_format: str) -> str:
+        logger.info("Profiled %s: %d samples in %.1f ms", name, sum(sampler.samples.values()),
+                    sampler.duration * 1000)
+        if output_format == COLLAPSED:
+            return collapsed(sampler)
+        return json.dumps(speedscope(sampler, name))
+
+    @staticmethod
+    def _path(scope, output_format: str) -> str:
+        route = scope["path"].strip("/").replace("/", "_") or "root"
+        extension = "txt" if output_format == COLLAPSED else "speedscope.json"
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return os.path.join(PROFILE_DIR, f'{stamp}-{scope["method"]}-{route}.{extension}')
+
+    @staticmethod
+    def _save(path: str, body: str):
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(body)
+        except OSError as e:
+            logger.error("Failed to save profile %s: %s", path, e)
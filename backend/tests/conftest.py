@@ -0,0 +1,78 @@
+import os
+import tempfile
+
+# 앱 모듈이 import 시점에 .env 를 읽으므로, 그 전에 테스트용 DB 와 설정을 환경 변수로 지정
+_db_path = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.update({
+    "SQLALCHEMY_DATABASE_URL": f"sqlite:///{_db_path}",
+    "SQLALCHEMY_DATABASE_URL_ASYNC": f"sqlite+aiosqlite:///{_db_path}",
+    "SECRET_KEY": "test",
+    "BCRYPT_ROUNDS": "5",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "TOKEN_REFRESH_ENABLED": "false",
+    "SQL_INSTRUMENTATION": "true",
+})
+
+from datetime import datetime, timedelta  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from jose import jwt  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+import db_instrumentation  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from domain.answer import answer_router  # noqa: E402
+from domain.question import question_cache, question_count, question_router, question_search  # noqa: E402
+from domain.user import user_router  # noqa: E402
+from models import Answer, Base, Question, User  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    """
+    질문 10개(답변 3개씩)를 담은 새 DB 와 Q&A router 로 구성한 TestClient. 모듈마다 새로 만든다.
+    """
+    Base.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {question_search.SEARCH_TABLE}"))
+    question_cache._details.clear()
+    question_count.question_total.invalidate()
+    question_count.search_changed()
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        users = [User(username=f"user{i}", password="x", email=f"user{i}@example.com") for i in range(3)]
+        db.add_all(users)
+        now = datetime.now()
+        for i in range(10):
+            question = Question(subject=f"question {i}", content="content", vote_count=len(users),
+                                create_date=now - timedelta(minutes=i), user=users[i % 3])
+            question.voter = users
+            question.answers = [Answer(content=f"answer {j}", create_date=now, user=users[j],
+                                       voter=users[:j + 1], vote_count=j + 1)
+                                for j in range(3)]
+            db.add(question)
+        db.commit()
+    question_search.ensure_search_index(engine)
+
+    # main.app 은 frontend 빌드를 mount 하므로 Q&A router 와 SQL 계측 middleware 만으로 구성
+    app = FastAPI()
+    app.add_middleware(db_instrumentation.SqlInstrumentationMiddleware)
+    app.include_router(question_router.router)
+    app.include_router(answer_router.router)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers():
+    """
+    username 으로 로그인한 것과 같은 Authorization 헤더를 만드는 함수.
+    """
+    def make(username: str) -> dict:
+        token = jwt.encode({"sub": username, "exp": datetime.utcnow() + timedelta(minutes=5)},
+                           user_router.SECRET_KEY, algorithm=user_router.ALGORITHM)
+        return {"Authorization": f"Bearer {token}"}
+    return make
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from database import SessionLocal
+from domain.answer import answer_crud
+from models import Answer
+
+
+def walk(client, question_id: int, sort: str, size: int, cursor: str = None) -> list:
+    answers = []
+    while True:
+        params = {"sort": sort, "size": size}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/api/answer/list/{question_id}", params=params)
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body["answer_list"]) <= size
+        answers += body["answer_list"]
+        cursor = body["next_cursor"]
+        if not cursor:
+            return answers
+
+
+def test_answers_by_votes_are_paged_without_gaps(client):
+    # 추천 수가 같은 답변이 페이지 경계에 걸치도록 추가
+    with SessionLocal() as db:
+        db.add_all(Answer(question_id=7, content=f"tie {i}", create_date=datetime.now(), vote_count=2)
+                   for i in range(4))
+        db.commit()
+        expected = db.execute(select(Answer.id, Answer.vote_count).where(Answer.question_id == 7)
+                              .order_by(Answer.vote_count.desc(), Answer.id.desc())).all()
+
+    answers = walk(client, 7, "votes", size=2)
+    assert [(answer["id"], answer["vote_count"]) for answer in answers] == [tuple(row) for row in expected]
+
+
+def test_question_detail_cursor_continues_answer_list(client):
+    # 상세에는 첫 ANSWER_PAGE_SIZE 개만 담기도록 답변을 추가
+    with SessionLocal() as db:
+        db.add_all(Answer(question_id=8, content=f"more {i}", create_date=datetime.now())
+                   for i in range(answer_crud.ANSWER_PAGE_SIZE))
+        db.commit()
+
+    detail = client.get("/api/question/detail/8").json()
+    first_page = [answer["id"] for answer in detail["answers"]]
+    assert len(first_page) == answer_crud.ANSWER_PAGE_SIZE and detail["answer_cursor"]
+    rest = walk(client, 8, "newest", size=1, cursor=detail["answer_cursor"])
+    assert first_page + [answer["id"] for answer in rest] == \
+        [answer["id"] for answer in walk(client, 8, "newest", size=100)]
+
+
+def test_cursor_of_another_sort_is_rejected(client):
+    newest_cursor = client.get("/api/answer/list/9", params={"size": 1}).json()["next_cursor"]
+    response = client.get("/api/answer/list/9", params={"sort": "votes", "cursor": newest_cursor})
+    assert response.status_code == 400
@@ -0,0 +1,30 @@
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+import database
+
+
+def pool_snapshot(tmp_path, max_overflow: int, checkouts: int) -> dict:
+    metrics = database.PoolMetrics("test")
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}",
+                           poolclass=database._timed_pool_class(QueuePool, metrics),
+                           pool_size=2, max_overflow=max_overflow)
+    connections = [engine.connect() for _ in range(checkouts)]
+    try:
+        return metrics.snapshot()
+    finally:
+        for connection in connections:
+            connection.close()
+        engine.dispose()
+
+
+def test_saturation_of_bounded_pool(tmp_path):
+    stats = pool_snapshot(tmp_path, max_overflow=2, checkouts=3)
+    assert stats["checked_out"] == 3 and stats["capacity"] == 4
+    assert stats["saturation"] == 0.75
+
+
+def test_unbounded_overflow_has_no_saturation(tmp_path):
+    stats = pool_snapshot(tmp_path, max_overflow=-1, checkouts=5)
+    assert stats["checked_out"] == 5 and stats["overflow"] == 3
+    assert "capacity" not in stats and "saturation" not in stats
@@ -0,0 +1,21 @@
+import logging
+
+import db_instrumentation
+
+
+def request_summaries(caplog) -> list:
+    return [record for record in caplog.records
+            if record.name == "db_instrumentation" and record.getMessage().startswith("GET /api/question/list:")]
+
+
+def test_slow_request_summary_is_logged_at_warning(client, caplog, monkeypatch):
+    caplog.set_level(logging.WARNING, logger="db_instrumentation")
+
+    monkeypatch.setattr(db_instrumentation, "SLOW_QUERY_MS", 10_000.0)
+    client.get("/api/question/list")
+    assert request_summaries(caplog) == []
+
+    monkeypatch.setattr(db_instrumentation, "SLOW_QUERY_MS", 0.0)
+    client.get("/api/question/list")
+    [record] = request_summaries(caplog)
+    assert record.levelno == logging.WARNING and "slowest" in record.getMessage()
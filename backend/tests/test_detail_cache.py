@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from database import SessionLocal
+from models import Answer, Question
+
+
+def change(model, entity_id: int, **values):
+    # 다른 worker 의 쓰기처럼 이 프로세스의 캐시 무효화 없이 DB 만 변경
+    with SessionLocal() as db:
+        db.execute(update(model).where(model.id == entity_id).values(**values))
+        db.commit()
+
+
+def test_matching_etag_returns_304(client):
+    response = client.get("/api/question/detail/3")
+    etag = response.headers["etag"]
+    assert response.status_code == 200 and response.headers["cache-control"] == "no-cache"
+
+    response = client.get("/api/question/detail/3", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["etag"] == etag
+    assert client.get("/api/question/detail/3", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_question_vote_count_change_invalidates_detail(client):
+    etag = client.get("/api/question/detail/4").headers["etag"]
+    change(Question, 4, vote_count=10)
+
+    response = client.get("/api/question/detail/4", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["vote_count"] == 10 and response.headers["etag"] != etag
+
+
+def test_question_modify_date_change_invalidates_detail(client):
+    etag = client.get("/api/question/detail/5").headers["etag"]
+    change(Question, 5, subject="edited", modify_date=datetime.now())
+
+    response = client.get("/api/question/detail/5", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["subject"] == "edited" and response.headers["etag"] != etag
+
+
+def test_answer_vote_count_change_invalidates_question_and_answer_detail(client):
+    question = client.get("/api/question/detail/6")
+    answer_id = question.json()["answers"][0]["id"]
+    answer_etag = client.get(f"/api/answer/detail/{answer_id}").headers["etag"]
+    assert client.get(f"/api/answer/detail/{answer_id}",
+                      headers={"If-None-Match": answer_etag}).status_code == 304
+    change(Answer, answer_id, vote_count=10)
+
+    response = client.get("/api/question/detail/6", headers={"If-None-Match": question.headers["etag"]})
+    assert response.status_code == 200
+    assert {answer["id"]: answer["vote_count"] for answer in response.json()["answers"]}[answer_id] == 10
+    response = client.get(f"/api/answer/detail/{answer_id}", headers={"If-None-Match": answer_etag})
+    assert response.status_code == 200 and response.json()["vote_count"] == 10
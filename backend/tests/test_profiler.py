@@ -0,0 +1,31 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiler
+
+
+def make_client(monkeypatch) -> TestClient:
+    monkeypatch.setattr(profiler, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "PROFILE_DIR", "")
+    app = FastAPI()
+    app.add_middleware(profiler.ProfilerMiddleware)
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_profile_requires_the_header(monkeypatch):
+    client = make_client(monkeypatch)
+
+    response = client.get("/ping", headers={"X-Profile": "secret"}, params={"__profile_format": "collapsed"})
+    assert response.headers["x-profile-status"] == "200"
+    assert response.headers["content-type"].startswith("text/plain")
+
+    # query string 의 token 은 무시 (로그에 남으므로 받지 않는다)
+    for params in ({"__profile": "secret"}, {}):
+        response = client.get("/ping", params=params)
+        assert response.json() == {"ok": True} and "x-profile-status" not in response.headers
+    assert client.get("/ping", headers={"X-Profile": "wrong"}).json() == {"ok": True}
@@ -0,0 +1,37 @@
+import re
+
+
+def query_count(response) -> int:
+    # Server-Timing: db;dur=1.2;desc="3 queries"
+    return int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+def test_question_list_query_count(client):
+    response = client.get("/api/question/list", params={"size": 10})
+    assert response.status_code == 200
+    question_list = response.json()["question_list"]
+    assert len(question_list) == 10
+    assert all(question["answer_count"] == 3 and question["user"] for question in question_list)
+    # 전체 건수 + 목록(답변 수 포함) + 작성자 selectinload
+    assert query_count(response) == 3
+
+
+def test_question_detail_query_count(client):
+    response = client.get("/api/question/detail/1")
+    assert response.status_code == 200
+    detail = response.json()
+    assert len(detail["answers"]) == 3 and len(detail["voter"]) == 3
+    # version + 질문 + 작성자 + 추천인 + 답변 페이지 + 답변 작성자 + 답변 추천인
+    assert query_count(response) == 7
+
+    # 캐시된 상세는 version 조회만
+    response = client.get("/api/question/detail/1")
+    assert query_count(response) == 1
+
+
+def test_answer_list_query_count(client):
+    response = client.get("/api/answer/list/2", params={"sort": "votes"})
+    assert response.status_code == 200
+    assert [answer["vote_count"] for answer in response.json()["answer_list"]] == [3, 2, 1]
+    # 답변 페이지 + 작성자 + 추천인
+    assert query_count(response) == 3
@@ -0,0 +1,32 @@
+import pytest
+
+
+@pytest.mark.parametrize("params", [{"size": 0}, {"size": -1}, {"size": 101}, {"page": -1}])
+def test_invalid_page_parameters(client, params):
+    assert client.get("/api/question/list", params=params).status_code == 422
+
+
+def test_cursor_pages_follow_offset_order(client):
+    expected = [question["id"] for question in client.get("/api/question/list", params={"size": 10}).json()["question_list"]]
+
+    ids, cursor = [], None
+    while True:
+        params = {"size": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/question/list", params=params)
+        assert response.status_code == 200
+        body = response.json()
+        ids += [question["id"] for question in body["question_list"]]
+        # 첫 페이지만 전체 건수를 계산
+        assert (body["total"] is None) == bool(cursor)
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert ids == expected
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "W10", "WyJ4IiwgMV0"])
+def test_bad_cursor_is_rejected(client, cursor):
+    response = client.get("/api/question/list", params={"cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,13 @@
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+
+from database import engine
+from domain.question import question_search
+from models import Base
+
+
+def test_autogenerate_keeps_search_index(client):
+    # client fixture 가 ensure_search_index 로 FTS5 테이블을 만든 상태
+    with engine.connect() as conn:
+        context = MigrationContext.configure(conn, opts={"include_object": question_search.include_object})
+        assert compare_metadata(context, Base.metadata) == []
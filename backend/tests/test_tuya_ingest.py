@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from database import SessionLocal, engine
+from models import Base, Tuya8in1, Tuya8in1Rollup
+from tuya import tuya_rollup
+from tuya.tuya_ingest import SENSOR_CODES, ReadingBuffer
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    Base.metadata.create_all(engine)
+    yield
+    with engine.begin() as conn:
+        conn.execute(Tuya8in1.__table__.delete())
+        conn.execute(Tuya8in1Rollup.__table__.delete())
+
+
+def reading(device_id: str, value: int = 1) -> dict:
+    values = {code: value for code in SENSOR_CODES}
+    return {"user_id": None, "device_id": device_id, "create_date": datetime(2024, 1, 1, 12, 30), "t": 0, **values}
+
+
+def count(model) -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(model))
+
+
+def test_flush_more_rollup_rows_than_one_statement_holds():
+    # 장치마다 8 metric x 3 granularity 개의 rollup 행 (행마다 bind 11 개).
+    # 1000 장치 = 264000 개로, SQLite 기본 한도 32766 과 빌드 최대값 250000 을 모두 넘는다
+    devices = 1000
+    buffer = ReadingBuffer(engine, max_size=10000, max_delay=60, max_buffered=100000)
+    buffer.add([reading(f"device{i}") for i in range(devices)])
+
+    assert buffer.flush() == devices
+    assert count(Tuya8in1) == devices
+    assert count(Tuya8in1Rollup) == devices * len(SENSOR_CODES) * len(tuya_rollup.GRANULARITIES)
+
+
+def test_batch_that_keeps_failing_drops_only_the_bad_row():
+    buffer = ReadingBuffer(engine, max_size=100, max_delay=60, max_buffered=1000, max_failures=2)
+    bad = dict(reading("device5"), create_date="not a date")
+    buffer.add([reading(f"device{i}") for i in range(5)] + [bad] + [reading(f"device{i}") for i in range(6, 10)])
+
+    # 처음에는 batch 전체를 버퍼에 되돌려 놓는다
+    with pytest.raises(Exception):
+        buffer.flush()
+    assert len(buffer) == 10 and count(Tuya8in1) == 0
+
+    # max_failures 번째 실패에서 batch 를 나누어 저장하고 잘못된 행만 버린다
+    assert buffer.flush() == 9
+    assert len(buffer) == 0 and buffer.rejected == 1
+    assert count(Tuya8in1) == 9
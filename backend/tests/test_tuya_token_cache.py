@@ -0,0 +1,42 @@
+import asyncio
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+
+from tuya import tuya_token_cache
+from tuya.tuya_token_cache import TuyaTokenCache
+
+
+def test_invalidate_discards_a_load_started_with_old_credentials(monkeypatch):
+    credentials = {"access_id": "old"}
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def fetch_and_save_token(tuya_config, db, user_id):
+        # 갱신 요청을 보낸 시점의 access id 로 토큰을 받는다
+        access_id = credentials["access_id"]
+        loads.append(access_id)
+        started.set()
+        release.wait(5)
+        tuya_config.access_token = f"token-{access_id}"
+
+    monkeypatch.setattr(tuya_token_cache, "get_tuya_config_by_user_id", lambda db, user_id: SimpleNamespace(
+        access_token=None, refresh_token="refresh", expire_time=7200, create_date=datetime.now()))
+    monkeypatch.setattr(tuya_token_cache, "is_token_expired", lambda tuya_config, margin: True)
+    monkeypatch.setattr(tuya_token_cache, "fetch_and_save_token", fetch_and_save_token)
+    cache = TuyaTokenCache(margin=300)
+
+    async def scenario():
+        waiter = asyncio.ensure_future(cache.get(1))
+        await asyncio.to_thread(started.wait, 5)
+        # /update_config: 갱신 도중 설정이 바뀌고 캐시를 무효화
+        credentials["access_id"] = "new"
+        cache.invalidate(1)
+        release.set()
+        return await waiter
+
+    token, refreshed = asyncio.run(scenario())
+    assert loads == ["old", "new"]
+    assert token["access_token"] == "token-new" and refreshed
+    assert cache._tokens[1]["access_token"] == "token-new"
+    assert not cache._inflight
@@ -0,0 +1,13 @@
+from passlib.hash import bcrypt
+
+from domain.user import user_password
+
+
+def test_hash_with_other_cost_is_rehashed():
+    rounds = user_password.BCRYPT_ROUNDS
+    assert not user_password.pwd_context.needs_update(user_password.hash_password_sync("secret"))
+    # cost 를 올린 경우와 내린 경우 모두 로그인 시 새 설정으로 재해시
+    for other in (rounds - 1, rounds + 1):
+        old_hash = bcrypt.using(rounds=other).hash("secret")
+        verified, new_hash = user_password.verify_and_update_sync("secret", old_hash)
+        assert verified and new_hash and bcrypt.from_string(new_hash).rounds == rounds
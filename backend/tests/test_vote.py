@@ -0,0 +1,38 @@
+from sqlalchemy import func, select
+
+from database import SessionLocal
+from models import Answer, Question, User, answer_voter, question_voter
+
+
+def voted(table, column, entity_id: int) -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(table).where(column == entity_id))
+
+
+def test_double_question_vote_counts_once(client, auth_headers):
+    with SessionLocal() as db:
+        db.add(User(username="voter", password="x", email="voter@example.com"))
+        db.commit()
+    headers = auth_headers("voter")
+
+    for _ in range(2):
+        response = client.post("/api/question/vote", json={"question_id": 1}, headers=headers)
+        assert response.status_code == 204
+        with SessionLocal() as db:
+            assert db.get(Question, 1).vote_count == 4
+        assert voted(question_voter, question_voter.c.question_id, 1) == 4
+    assert client.get("/api/question/detail/1").json()["vote_count"] == 4
+
+
+def test_double_answer_vote_counts_once(client, auth_headers):
+    with SessionLocal() as db:
+        answer_id = db.scalar(select(Answer.id).where(Answer.question_id == 2, Answer.vote_count == 1))
+    headers = auth_headers("user2")
+
+    for _ in range(2):
+        response = client.post("/api/answer/vote", json={"answer_id": answer_id}, headers=headers)
+        assert response.status_code == 204
+        with SessionLocal() as db:
+            assert db.get(Answer, answer_id).vote_count == 2
+        assert voted(answer_voter, answer_voter.c.answer_id, answer_id) == 2
+    assert client.get(f"/api/answer/detail/{answer_id}").json()["vote_count"] == 2
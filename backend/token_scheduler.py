@@ -0,0 +1,234 @@
+import asyncio
+import heapq
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import or_, update
+from starlette.config import Config
+
+from database import SessionLocal, engine, insert_ignore
+from heyhome.heyhome_utility import apply_token, request_new_token
+from models import HeyhomeInfo, SchedulerLease, TuyaInfo
+from tuya.tuya_token_cache import tuya_token_cache
+from tuya.tuya_utility import apply_tuya_token, client_pool, request_tuya_token, run_tuya_call
+
+logger = logging.getLogger(__name__)
+
+config = Config('.env')
+TOKEN_REFRESH_ENABLED = config('TOKEN_REFRESH_ENABLED', cast=bool, default=True)
+TOKEN_REFRESH_MARGIN = config('TOKEN_REFRESH_MARGIN', cast=int, default=600)
+TOKEN_REFRESH_CONCURRENCY = config('TOKEN_REFRESH_CONCURRENCY', cast=int, default=4)
+TOKEN_REFRESH_RESCAN_SECONDS = config('TOKEN_REFRESH_RESCAN_SECONDS', cast=float, default=300.0)
+TOKEN_REFRESH_RETRY_SECONDS = config('TOKEN_REFRESH_RETRY_SECONDS', cast=float, default=300.0)
+TOKEN_REFRESH_BATCH_SIZE = config('TOKEN_REFRESH_BATCH_SIZE', cast=int, default=50)
+TOKEN_REFRESH_LEASE_SECONDS = config('TOKEN_REFRESH_LEASE_SECONDS', cast=float, default=120.0)
+
+TUYA = "tuya"
+HEYHOME = "heyhome"
+LEASE_NAME = "token_refresh"
+
+
+def _due_at(issued_at: datetime, lifetime: int, margin: int) -> float:
+    # 수명이 margin 보다 짧은 토큰도 발급 직후 바로 다시 갱신하지 않도록 margin 은 수명의 절반까지만
+    return issued_at.timestamp() + lifetime - min(margin, lifetime / 2)
+
+
+def _tuya_due_at(tuya_config: TuyaInfo, margin: int) -> float:
+    if not tuya_config.access_token or not tuya_config.create_date or not tuya_config.expire_time:
+        return 0.0
+    return _due_at(tuya_config.create_date, tuya_config.expire_time, margin)
+
+
+def _heyhome_due_at(heyhome_info: HeyhomeInfo, margin: int) -> float:
+    if not heyhome_info.access_token or not heyhome_info.issued_at or not heyhome_info.expires_in:
+        return 0.0
+    return _due_at(heyhome_info.issued_at, heyhome_info.expires_in, margin)
+
+
+def acquire_lease(name: str, owner: str, seconds: float) -> bool:
+    """
+    Take or renew the named lease in the DB. Only one process holds it until it expires.
+    """
+    now = datetime.now()
+    expires_at = now + timedelta(seconds=seconds)
+    with SessionLocal() as db:
+        if insert_ignore(db, SchedulerLease.__table__, name=name, owner=owner, expires_at=expires_at):
+            db.commit()
+            return True
+        result = db.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == name,
+                   or_(SchedulerLease.owner == owner, SchedulerLease.expires_at < now))
+            .values(owner=owner, expires_at=expires_at)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+
+def load_schedule(margin: int) -> List[Tuple[float, str, int]]:
+    """
+    Tuya/HeyHome 자격 증명 전체의 (갱신 예정 시각, provider, row id) 목록을 조회.
+    """
+    with SessionLocal() as db:
+        schedule = [
+            (_tuya_due_at(row, margin), TUYA, row.id)
+            for row in db.query(TuyaInfo).filter(TuyaInfo.access_id.isnot(None))
+        ]
+        schedule += [
+            (_heyhome_due_at(row, margin), HEYHOME, row.id)
+            for row in db.query(HeyhomeInfo).filter(HeyhomeInfo.client_id.isnot(None))
+        ]
+    return schedule
+
+
+class TokenRefreshScheduler:
+    """
+    만료 시각 기준 우선순위 큐로 모든 provider 토큰을 만료 전에 갱신하는 백그라운드 작업.
+    갱신은 최대 concurrency 개까지 동시에 요청하고, 결과는 한 번의 commit 으로 저장한다.
+    worker 가 여러 개여도 DB lease 를 가진 프로세스만 갱신한다.
+    """
+    def __init__(self, margin: int, concurrency: int, rescan_seconds: float,
+                 retry_seconds: float, batch_size: int, lease_seconds: float):
+        self.margin = margin
+        self.concurrency = concurrency
+        self.rescan_seconds = rescan_seconds
+        self.retry_seconds = retry_seconds
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue: List[Tuple[float, str, int]] = []
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            await asyncio.to_thread(SchedulerLease.__table__.create, engine, checkfirst=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        next_scan_at = 0.0
+        while True:
+            try:
+                now = time.time()
+                if now >= next_scan_at:
+                    self._queue = await asyncio.to_thread(load_schedule, self.margin)
+                    heapq.heapify(self._queue)
+                    next_scan_at = now + self.rescan_seconds
+
+                due = []
+                while self._queue and self._queue[0][0] <= now and len(due) < self.batch_size:
+                    due.append(heapq.heappop(self._queue))
+                if due:
+                    if await asyncio.to_thread(acquire_lease, LEASE_NAME, self.owner, self.lease_seconds):
+                        await self.refresh(due, semaphore)
+                    else:
+                        # 다른 worker 가 갱신 중. lease 가 끝난 뒤 DB 에서 다시 확인
+                        for _, provider, row_id in due:
+                            heapq.heappush(self._queue, (now + self.lease_seconds, provider, row_id))
+                    continue
+
+                wake_at = min(next_scan_at, self._queue[0][0]) if self._queue else next_scan_at
+                await asyncio.sleep(max(0.0, wake_at - time.time()))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Token refresh scheduler iteration failed")
+                await asyncio.sleep(self.retry_seconds)
+
+    async def refresh(self, due: List[Tuple[float, str, int]], semaphore: asyncio.Semaphore):
+        """
+        만료가 임박한 토큰들을 동시에 갱신하고 결과를 일괄 저장한 뒤 다음 갱신을 예약.
+        """
+        rows, fresh = await asyncio.to_thread(self._load_rows, due)
+        # 다른 worker 나 요청 경로에서 이미 갱신된 토큰은 새 만료 시각으로 다시 예약
+        for item in fresh:
+            heapq.heappush(self._queue, item)
+        if not rows:
+            return
+
+        async def request(provider: str, row):
+            async with semaphore:
+                try:
+                    if provider == TUYA:
+                        return provider, row.id, await run_tuya_call(request_tuya_token, row)
+                    return provider, row.id, await request_new_token(row)
+                except Exception as e:
+                    logger.warning("Token refresh failed for %s #%s: %s", provider, row.id, e)
+                    return provider, row.id, None
+
+        results = await asyncio.gather(*(request(provider, row) for provider, row in rows))
+        saved = await asyncio.to_thread(self._save, results)
+
+        retry_at = time.time() + self.retry_seconds
+        for provider, row_id, _ in results:
+            heapq.heappush(self._queue, (saved.get((provider, row_id), retry_at), provider, row_id))
+
+    def _load_rows(self, due: List[Tuple[float, str, int]]) -> Tuple[list, List[Tuple[float, str, int]]]:
+        """
+        Reload the due rows. Return (rows still due, (due at, provider, row id) of rows refreshed elsewhere).
+        """
+        models = {TUYA: (TuyaInfo, _tuya_due_at), HEYHOME: (HeyhomeInfo, _heyhome_due_at)}
+        now = time.time()
+        rows, fresh = [], []
+        with SessionLocal() as db:
+            for _, provider, row_id in due:
+                model, due_at = models[provider]
+                row = db.get(model, row_id)
+                if row is None:
+                    continue
+                row_due_at = due_at(row, self.margin)
+                if row_due_at > now:
+                    fresh.append((row_due_at, provider, row_id))
+                else:
+                    rows.append((provider, row))
+            db.expunge_all()
+        return rows, fresh
+
+    def _save(self, results: list) -> Dict[Tuple[str, int], float]:
+        """
+        갱신된 토큰을 한 번에 commit 하고 (provider, row id) 별 다음 갱신 시각을 반환.
+        """
+        saved = {}
+        tuya_users = []
+        with SessionLocal() as db:
+            for provider, row_id, token_data in results:
+                if token_data is None:
+                    continue
+                if provider == TUYA:
+                    row = db.get(TuyaInfo, row_id)
+                    if row is None:
+                        continue
+                    apply_tuya_token(row, dict(token_data, user_id=row.user_id))
+                    saved[(provider, row_id)] = _tuya_due_at(row, self.margin)
+                    tuya_users.append(row.user_id)
+                else:
+                    row = db.get(HeyhomeInfo, row_id)
+                    if row is None:
+                        continue
+                    apply_token(row, token_data)
+                    saved[(provider, row_id)] = _heyhome_due_at(row, self.margin)
+            db.commit()
+        for user_id in tuya_users:
+            client_pool.invalidate(user_id)
+            tuya_token_cache.invalidate(user_id)
+        return saved
+
+
+token_scheduler = TokenRefreshScheduler(
+    margin=TOKEN_REFRESH_MARGIN,
+    concurrency=TOKEN_REFRESH_CONCURRENCY,
+    rescan_seconds=TOKEN_REFRESH_RESCAN_SECONDS,
+    retry_seconds=TOKEN_REFRESH_RETRY_SECONDS,
+    batch_size=TOKEN_REFRESH_BATCH_SIZE,
+    lease_seconds=TOKEN_REFRESH_LEASE_SECONDS,
+)
@@ -0,0 +1,330 @@
+import asyncio
+import csv
+import io
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import exc, insert
+from sqlalchemy.engine import Connection, Engine
+from starlette.config import Config
+
+from database import engine, SessionLocal
+from models import TuyaInfo, Tuya8in1
+from tuya.tuya_rollup import apply_rollups
+from tuya.tuya_utility import client_pool
+
+logger = logging.getLogger(__name__)
+
+config = Config('.env')
+TUYA_INGEST_ENABLED = config('TUYA_INGEST_ENABLED', cast=bool, default=False)
+TUYA_INGEST_POLL_SECONDS = config('TUYA_INGEST_POLL_SECONDS', cast=float, default=5.0)
+TUYA_INGEST_BATCH_SIZE = config('TUYA_INGEST_BATCH_SIZE', cast=int, default=500)
+TUYA_INGEST_FLUSH_SECONDS = config('TUYA_INGEST_FLUSH_SECONDS', cast=float, default=10.0)
+TUYA_INGEST_DISCOVERY_SECONDS = config('TUYA_INGEST_DISCOVERY_SECONDS', cast=float, default=300.0)
+TUYA_INGEST_PAGE_SIZE = config('TUYA_INGEST_PAGE_SIZE', cast=int, default=100)
+# DB 장애 동안 버퍼에 쌓아 둘 최대 행 수. 넘으면 가장 오래된 행부터 버린다.
+TUYA_INGEST_MAX_BUFFERED = config('TUYA_INGEST_MAX_BUFFERED', cast=int, default=50000)
+TUYA_INGEST_MAX_PAGES = config('TUYA_INGEST_MAX_PAGES', cast=int, default=100)
+# 같은 batch 가 이 횟수만큼 연속으로 실패하면 반씩 나누어 저장하고, 혼자서도 실패하는 행은 버린다
+TUYA_INGEST_MAX_FLUSH_FAILURES = config('TUYA_INGEST_MAX_FLUSH_FAILURES', cast=int, default=3)
+
+SENSOR_CODES = (
+    "temp_current",
+    "ph_current",
+    "tds_current",
+    "salinity_current",
+    "pro_current",
+    "orp_current",
+    "cf_current",
+    "rf_current",
+)
+READING_COLUMNS = ("user_id", "device_id", "create_date") + SENSOR_CODES + ("t",)
+
+STATUS_BATCH_SIZE = 20  # Tuya 일괄 상태 조회 API 의 device_ids 최대 개수
+INSERT_CHUNK_SIZE = 500  # multi-row INSERT 한 문장에 담을 최대 행 수
+
+
+def parse_status(user_id: int, device_id: str, status: list, t: Optional[int]) -> Optional[dict]:
+    """
+    Tuya 상태 목록을 Tuya8in1 행으로 변환. 수질 센서 코드가 없으면 None.
+    """
+    values = {item.get("code"): item.get("value") for item in status}
+    if not any(code in values for code in SENSOR_CODES):
+        return None
+    reading = {code: values.get(code) for code in SENSOR_CODES}
+    reading["user_id"] = user_id
+    reading["device_id"] = device_id
+    reading["create_date"] = datetime.now()
+    reading["t"] = t
+    return reading
+
+
+def bulk_insert_readings(bind: Engine, readings: List[dict]):
+    """
+    측정값을 한 트랜잭션으로 저장하고 rollup 을 갱신.
+    PostgreSQL(psycopg2)은 COPY, 그 외에는 multi-row INSERT 사용.
+    """
+    if not readings:
+        return
+    with bind.begin() as conn:
+        if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+            _copy_readings(conn, readings)
+        else:
+            for start in range(0, len(readings), INSERT_CHUNK_SIZE):
+                conn.execute(insert(Tuya8in1).values(readings[start:start + INSERT_CHUNK_SIZE]))
+        apply_rollups(conn, readings, SENSOR_CODES)
+
+
+def _copy_readings(conn: Connection, readings: List[dict]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for reading in readings:
+        writer.writerow(["" if reading.get(column) is None else reading[column] for column in READING_COLUMNS])
+    buffer.seek(0)
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {Tuya8in1.__tablename__} ({', '.join(READING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _is_transient(error: Exception) -> bool:
+    """
+    연결 끊김, pool timeout 처럼 행과 관계없이 DB 를 쓸 수 없는 오류.
+    """
+    if isinstance(error, (exc.DisconnectionError, exc.TimeoutError)):
+        return True
+    return isinstance(error, exc.DBAPIError) and error.connection_invalidated
+
+
+class ReadingBuffer:
+    """
+    측정값을 메모리에 모아두었다가 크기 또는 시간 임계값에 도달하면 일괄 저장.
+    """
+    def __init__(self, bind: Engine, max_size: int, max_delay: float, max_buffered: int,
+                 max_failures: int = TUYA_INGEST_MAX_FLUSH_FAILURES):
+        self.bind = bind
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.max_buffered = max_buffered
+        self.max_failures = max_failures
+        self.dropped = 0  # max_buffered 를 넘어 버린 누적 행 수
+        self.rejected = 0  # 저장할 수 없어 버린 누적 행 수
+        self._failures = 0  # 버퍼 앞쪽 batch 의 연속 실패 횟수
+        self._lock = threading.Lock()
+        self._readings: List[dict] = []
+        self._first_added_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._readings)
+
+    def add(self, readings: List[dict]) -> bool:
+        """
+        측정값을 버퍼에 추가하고 크기 임계값 도달 여부를 반환.
+        """
+        if not readings:
+            return False
+        with self._lock:
+            if not self._readings:
+                self._first_added_at = time.monotonic()
+            self._readings.extend(readings)
+            self._drop_oldest()
+            return len(self._readings) >= self.max_size
+
+    def is_due(self) -> bool:
+        with self._lock:
+            if not self._readings:
+                return False
+            if len(self._readings) >= self.max_size:
+                return True
+            return time.monotonic() - self._first_added_at >= self.max_delay
+
+    def flush(self) -> int:
+        """
+        버퍼의 측정값을 모두 저장하고 저장한 행 수를 반환. 실패하면 다음 flush 를 위해 되돌려 놓는다.
+        max_failures 번 연속 실패한 batch 는 반씩 나누어 저장하고, 혼자서도 실패하는 행은 버린다.
+        """
+        with self._lock:
+            readings, self._readings = self._readings, []
+            first_added_at, self._first_added_at = self._first_added_at, None
+        if not readings:
+            return 0
+        try:
+            bulk_insert_readings(self.bind, readings)
+        except Exception as e:
+            self._failures += 1
+            if _is_transient(e) or self._failures < self.max_failures:
+                self._restore(readings, first_added_at)
+                raise
+            logger.warning("Tuya 8in1 batch of %d readings failed %d times, bisecting: %s",
+                           len(readings), self._failures, e)
+            return self._bisect(readings, first_added_at)
+        self._failures = 0
+        return len(readings)
+
+    def _bisect(self, readings: List[dict], first_added_at: Optional[float]) -> int:
+        saved = 0
+        pending = [readings]
+        while pending:
+            chunk = pending.pop(0)
+            try:
+                bulk_insert_readings(self.bind, chunk)
+                saved += len(chunk)
+            except Exception as e:
+                if _is_transient(e):
+                    # DB 를 쓸 수 없으면 나누어도 소용없으므로 남은 행을 되돌려 놓는다
+                    self._restore(chunk + [reading for rest in pending for reading in rest], first_added_at)
+                    raise
+                if len(chunk) == 1:
+                    with self._lock:
+                        self.rejected += 1
+                    logger.error("Dropped Tuya 8in1 reading that cannot be saved (%s): %r", e, chunk[0])
+                    continue
+                middle = len(chunk) // 2
+                pending[:0] = [chunk[:middle], chunk[middle:]]
+        self._failures = 0
+        return saved
+
+    def _restore(self, readings: List[dict], first_added_at: Optional[float]):
+        with self._lock:
+            self._readings = readings + self._readings
+            self._first_added_at = first_added_at
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        # self._lock 을 잡은 상태에서 호출
+        overflow = len(self._readings) - self.max_buffered
+        if overflow > 0:
+            del self._readings[:overflow]
+            self.dropped += overflow
+            logger.warning("Tuya 8in1 buffer full, dropped %d oldest readings (%d in total)",
+                           overflow, self.dropped)
+
+
+class Tuya8in1Ingestor:
+    """
+    등록된 모든 TuyaInfo 의 8-in-1 수질 센서 상태를 주기적으로 수집.
+    """
+    def __init__(self, buffer: ReadingBuffer, poll_seconds: float, discovery_seconds: float):
+        self.buffer = buffer
+        self.poll_seconds = poll_seconds
+        self.discovery_seconds = discovery_seconds
+        self._device_ids = {}  # user_id -> (조회 시각, device id 목록)
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._poll_loop()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.buffer.flush)
+
+    async def _poll_loop(self):
+        while True:
+            started_at = time.monotonic()
+            try:
+                await asyncio.to_thread(self.poll_once)
+            except Exception:
+                logger.exception("Tuya 8in1 polling failed")
+            await asyncio.sleep(max(0.0, self.poll_seconds - (time.monotonic() - started_at)))
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(min(1.0, self.buffer.max_delay))
+            if self.buffer.is_due():
+                try:
+                    await asyncio.to_thread(self.buffer.flush)
+                except Exception:
+                    logger.exception("Tuya 8in1 flush failed")
+
+    def poll_once(self):
+        """
+        모든 설정의 센서 상태를 한 번 수집하고, 크기 임계값에 도달하면 즉시 저장.
+        """
+        with SessionLocal() as db:
+            tuya_configs = db.query(TuyaInfo).filter(TuyaInfo.access_id.isnot(None)).all()
+            db.expunge_all()
+        for tuya_config in tuya_configs:
+            try:
+                readings = self.collect(tuya_config)
+            except Exception:
+                logger.exception("Tuya 8in1 collection failed for user %s", tuya_config.user_id)
+                continue
+            if self.buffer.add(readings):
+                try:
+                    self.buffer.flush()
+                except Exception:
+                    # 실패한 행은 버퍼에 남아 있으므로 다음 flush 에서 다시 저장. 나머지 사용자는 계속 수집
+                    logger.exception("Tuya 8in1 flush failed")
+
+    def collect(self, tuya_config: TuyaInfo) -> List[dict]:
+        device_ids = self._get_device_ids(tuya_config)
+        readings = []
+        for start in range(0, len(device_ids), STATUS_BATCH_SIZE):
+            chunk = device_ids[start:start + STATUS_BATCH_SIZE]
+            response = self._get(tuya_config, "/v1.0/iot-03/devices/status", {"device_ids": ",".join(chunk)})
+            if not response or not response.get("success"):
+                continue
+            for device in response.get("result", []):
+                reading = parse_status(tuya_config.user_id, device.get("id"), device.get("status", []), response.get("t"))
+                if reading:
+                    readings.append(reading)
+        return readings
+
+    @staticmethod
+    def _get(tuya_config: TuyaInfo, path: str, params: dict):
+        # 요청 스레드와 같은 클라이언트를 공유하므로 호출 하나씩만 lock 을 잡는다
+        with client_pool.client(tuya_config) as openapi:
+            return openapi.get(path, params)
+
+    def _get_device_ids(self, tuya_config: TuyaInfo) -> List[str]:
+        cached = self._device_ids.get(tuya_config.user_id)
+        if cached and time.monotonic() - cached[0] < self.discovery_seconds:
+            return cached[1]
+        device_ids = []
+        seen = set()
+        last_id = None
+        # 마지막 device id(last_id) 기준으로 다음 페이지를 조회. 페이지가 덜 차면 끝
+        for _ in range(TUYA_INGEST_MAX_PAGES):
+            params = {"page_size": TUYA_INGEST_PAGE_SIZE}
+            if last_id:
+                params["last_id"] = last_id
+            response = self._get(tuya_config, "/v2.0/cloud/thing/device", params)
+            if not response or not response.get("success"):
+                if cached:
+                    return cached[1]
+                break
+            page = [device.get("id") for device in response.get("result") or [] if device.get("id")]
+            new_ids = [device_id for device_id in page if device_id not in seen]
+            device_ids += new_ids
+            seen.update(new_ids)
+            if len(page) < TUYA_INGEST_PAGE_SIZE or not new_ids:
+                break
+            last_id = page[-1]
+        else:
+            logger.warning("Tuya device discovery for user %s stopped after %d pages",
+                           tuya_config.user_id, TUYA_INGEST_MAX_PAGES)
+        self._device_ids[tuya_config.user_id] = (time.monotonic(), device_ids)
+        return device_ids
+
+
+ingestor = Tuya8in1Ingestor(
+    ReadingBuffer(engine, TUYA_INGEST_BATCH_SIZE, TUYA_INGEST_FLUSH_SECONDS, TUYA_INGEST_MAX_BUFFERED),
+    poll_seconds=TUYA_INGEST_POLL_SECONDS,
+    discovery_seconds=TUYA_INGEST_DISCOVERY_SECONDS,
+)
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from starlette.config import Config
+
+from models import Tuya8in1Rollup
+
+config = Config('.env')
+TUYA_ROLLUP_MAX_POINTS = config('TUYA_ROLLUP_MAX_POINTS', cast=int, default=1000)
+
+# 행마다 11 개의 bind 변수. SQLite(최대 32766)와 PostgreSQL(최대 65535) 한도 아래로 나누어 INSERT
+UPSERT_CHUNK_SIZE = 1000
+
+# 세분화 순서대로 정렬 (fine -> coarse)
+GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def truncate(value: datetime, granularity: str) -> datetime:
+    """
+    시각을 해당 granularity 버킷의 시작 시각으로 내림.
+    """
+    if granularity == "minute":
+        return value.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def choose_granularity(start: datetime, end: datetime, max_points: int = TUYA_ROLLUP_MAX_POINTS) -> str:
+    """
+    요청 구간을 max_points 개 이하의 버킷으로 덮을 수 있는 가장 세밀한 rollup 을 선택.
+    30일 구간은 hour(720 버킷), 1년 구간은 day 로 응답한다.
+    """
+    span = end - start
+    for granularity, width in GRANULARITIES.items():
+        if span / width <= max_points:
+            return granularity
+    return "day"
+
+
+def summarize(readings: List[dict], metrics) -> List[dict]:
+    """
+    측정값 묶음을 (device, metric, granularity, bucket) 단위의 부분 집계로 변환.
+    """
+    buckets = {}
+    for reading in readings:
+        for metric in metrics:
+            value = reading.get(metric)
+            if value is None:
+                continue
+            for granularity in GRANULARITIES:
+                key = (reading["device_id"], metric, granularity, truncate(reading["create_date"], granularity))
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = {
+                        "user_id": reading["user_id"],
+                        "device_id": key[0],
+                        "metric": metric,
+                        "granularity": granularity,
+                        "bucket_start": key[3],
+                        "count": 1,
+                        "min_value": value,
+                        "max_value": value,
+                        "mean_value": float(value),
+                        "last_value": value,
+                        "last_date": reading["create_date"],
+                    }
+                    continue
+                bucket["mean_value"] += (value - bucket["mean_value"]) / (bucket["count"] + 1)
+                bucket["count"] += 1
+                bucket["min_value"] = min(bucket["min_value"], value)
+                bucket["max_value"] = max(bucket["max_value"], value)
+                if reading["create_date"] >= bucket["last_date"]:
+                    bucket["last_value"] = value
+                    bucket["last_date"] = reading["create_date"]
+    return list(buckets.values())
+
+
+def apply_rollups(conn: Connection, readings: List[dict], metrics):
+    """
+    새 측정값을 minute/hour/day rollup 에 증분 반영 (INSERT ... ON CONFLICT DO UPDATE).
+    """
+    rows = summarize(readings, metrics)
+    dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        conn.execute(_upsert(dialect, rows[start:start + UPSERT_CHUNK_SIZE]))
+
+
+def _upsert(dialect, rows: List[dict]):
+    table = Tuya8in1Rollup.__table__
+    stmt = dialect.insert(table).values(rows)
+    excluded = stmt.excluded
+    total = table.c.count + excluded.count
+    is_newer = excluded.last_date >= table.c.last_date
+    return stmt.on_conflict_do_update(
+        index_elements=["device_id", "metric", "granularity", "bucket_start"],
+        set_={
+            "count": total,
+            "min_value": case((excluded.min_value < table.c.min_value, excluded.min_value), else_=table.c.min_value),
+            "max_value": case((excluded.max_value > table.c.max_value, excluded.max_value), else_=table.c.max_value),
+            "mean_value": (table.c.mean_value * table.c.count + excluded.mean_value * excluded.count) / total,
+            "last_value": case((is_newer, excluded.last_value), else_=table.c.last_value),
+            "last_date": case((is_newer, excluded.last_date), else_=table.c.last_date),
+        },
+    )
+
+
+def get_sensor_rollups(db: Session, user_id: int, device_id: str, metric: str,
+                       granularity: str, start: datetime, end: datetime) -> List[Tuya8in1Rollup]:
+    """
+    구간 [start, end) 에 걸치는 rollup 버킷을 시간순으로 조회.
+    """
+    return db.query(Tuya8in1Rollup).filter(
+        Tuya8in1Rollup.user_id == user_id,
+        Tuya8in1Rollup.device_id == device_id,
+        Tuya8in1Rollup.metric == metric,
+        Tuya8in1Rollup.granularity == granularity,
+        Tuya8in1Rollup.bucket_start >= truncate(start, granularity),
+        Tuya8in1Rollup.bucket_start < end,
+    ).order_by(Tuya8in1Rollup.bucket_start).all()
@@ -1,11 +1,27 @@
+from datetime import datetime
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from models import TuyaInfo, User
-from database import get_db
+import fast_json
+from models import User
+from database import get_db, get_read_db
 from domain.user.user_router import get_current_user
-from tuya.tuya_schema import TuyaConfigRequest, TuyaConfigResponse, TuyaTokenResponse
-from tuya.tuya_utility import initialize_openapi, fetch_and_save_token, is_token_expired, get_tuya_config_by_user_id
+from tuya.tuya_ingest import SENSOR_CODES
+from tuya.tuya_rollup import GRANULARITIES, choose_granularity, get_sensor_rollups
+from tuya.tuya_token_cache import tuya_token_cache
+from tuya.tuya_schema import TuyaConfigRequest, TuyaConfigResponse, TuyaTokenResponse, SensorAggregateResponse
+from tuya.tuya_utility import (
+    client_pool,
+    fetch_device_list,
+    get_tuya_config_by_user_id,
+    request_tuya_token,
+    run_tuya_call,
+    save_tuya_config,
+    update_tuya_token,
+)
 
 router = APIRouter(
     prefix="/api/tuya", 
@@ -17,7 +33,7 @@ async def get_tuya_config(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    tuya_config = get_tuya_config_by_user_id(db, current_user.id)
+    tuya_config = await run_in_threadpool(get_tuya_config_by_user_id, db, current_user.id)
     if not tuya_config:
         raise HTTPException(status_code=404, detail="Tuya configuration not found.")
     return TuyaConfigResponse.from_orm(tuya_config)
@@ -39,30 +55,20 @@ async def update_tuya_config(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    # 현재 사용자와 연결된 Tuya 설정 가져오기
-    tuya_config = get_tuya_config_by_user_id(db, current_user.id)
-    
-    if not tuya_config:
-        # Tuya 설정이 없으면 새로 생성
-        tuya_config = TuyaInfo(
-            user_id=current_user.id,
-            access_id=config_data.access_id,
-            access_key=config_data.access_key,
-            api_endpoint=config_data.api_endpoint,
-        )
-        db.add(tuya_config)
-        db.commit()
-        db.refresh(tuya_config)
-    else:
-        # 기존 설정 업데이트
-        tuya_config.access_id = config_data.access_id
-        tuya_config.access_key = config_data.access_key
-        tuya_config.api_endpoint = config_data.api_endpoint
-        db.commit()
-    
-    # 토큰 발급 및 저장
-    token_data = fetch_and_save_token(tuya_config, db, current_user.id)
-    
+    # 현재 사용자와 연결된 Tuya 설정 생성 또는 업데이트
+    tuya_config = await run_in_threadpool(
+        save_tuya_config, db, current_user.id,
+        config_data.access_id, config_data.access_key, config_data.api_endpoint,
+    )
+
+    # 토큰 발급은 Tuya executor 에서, 저장은 요청의 Session 으로.
+    # timeout(504) 후에도 executor 스레드는 계속 돌 수 있으므로 Session 을 넘기지 않는다.
+    token_data = await run_tuya_call(request_tuya_token, tuya_config)
+    token_data["user_id"] = current_user.id
+    await run_in_threadpool(update_tuya_token, tuya_config, token_data, db)
+    client_pool.invalidate(current_user.id)
+    tuya_token_cache.invalidate(current_user.id)
+
     return TuyaTokenResponse(**token_data, status="Token reissued and saved to database.")
 
 # @router.get("/get_token", response_model=TuyaTokenResponse, status_code=200)
@@ -88,33 +94,20 @@ async def update_tuya_config(
 @router.get("/get_token", response_model=TuyaTokenResponse, status_code=200)
 async def get_token(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
     Retrieve a valid token for the current user.
-    If no token exists or it is expired, request and refresh a new token.
+    If no token exists or it is about to expire, a single refresh is shared by all concurrent requests.
     """
-    # Fetch Tuya configuration from the database
-    tuya_config = get_tuya_config_by_user_id(db, current_user.id)
-    if not tuya_config:
+    token, refreshed = await tuya_token_cache.get(current_user.id)
+    if not token:
         raise HTTPException(status_code=404, detail="Tuya configuration not found. Please update the configuration first.")
 
-    # Check if the token is missing or expired
-    if not tuya_config.access_token or is_token_expired(tuya_config):
-        token_data = fetch_and_save_token(tuya_config, db, current_user.id)
-        return TuyaTokenResponse(
-            access_token=token_data.get("access_token"),
-            refresh_token=token_data.get("refresh_token"),
-            expire_time=token_data.get("expire_time"),
-            status="Token refreshed."
-        )
-
-    # Return the existing valid token
     return TuyaTokenResponse(
-        access_token=tuya_config.access_token,
-        refresh_token=tuya_config.refresh_token,
-        expire_time=tuya_config.expire_time,
-        status="Token is still valid."
+        access_token=token["access_token"],
+        refresh_token=token["refresh_token"],
+        expire_time=token["expire_time"],
+        status="Token refreshed." if refreshed else "Token is still valid."
     )
 
 @router.get("/device_list", status_code=200)
@@ -123,17 +116,15 @@ async def get_device_list(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    tuya_config = get_tuya_config_by_user_id(db, current_user.id)
+    tuya_config = await run_in_threadpool(get_tuya_config_by_user_id, db, current_user.id)
     if not tuya_config:
         raise HTTPException(status_code=404, detail="Tuya configuration not found.")
 
-    openapi = initialize_openapi(tuya_config)
-    openapi.connect()
     try:
-        response = openapi.get(f"/v2.0/cloud/thing/device?page_size={page_size}")
+        response = await run_tuya_call(fetch_device_list, tuya_config, page_size)
         if response.get("success"):
             devices = response.get("result", [])
-            return {
+            return fast_json.json_response({
                 "success": response.get("success"),
                 "page_size": page_size,
                 "total_devices": len(devices),
@@ -154,11 +145,46 @@ async def get_device_list(
                     }
                     for device in devices
                 ],
-            }
+            })
         else:
             raise HTTPException(
                 status_code=400,
                 detail=f"Failed to fetch device list: {response.get('msg', 'Unknown error')}"
             )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching device list: {str(e)}")
+
+@router.get("/sensor/aggregate", response_model=SensorAggregateResponse, status_code=200)
+def get_sensor_aggregate(
+    device_id: str,
+    metric: str,
+    start: datetime,
+    end: datetime,
+    granularity: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Return min/max/mean/count/last per bucket for one device metric over [start, end).
+    Without an explicit granularity, the rollup is picked from the length of the range.
+    """
+    if metric not in SENSOR_CODES:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be later than start.")
+    if granularity is None:
+        granularity = choose_granularity(start, end)
+    elif granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown granularity: {granularity}")
+
+    points = get_sensor_rollups(db, current_user.id, device_id, metric, granularity, start, end)
+    return fast_json.model_response(SensorAggregateResponse, SensorAggregateResponse(
+        device_id=device_id,
+        metric=metric,
+        granularity=granularity,
+        start=start,
+        end=end,
+        points=points,
+    ))
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class TuyaConfigRequest(BaseModel):
@@ -48,3 +48,30 @@ class TuyaTokenResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class SensorAggregatePoint(BaseModel):
+    """
+    rollup 버킷 하나의 집계값.
+    """
+    bucket_start: datetime
+    count: int
+    min_value: Optional[float]
+    max_value: Optional[float]
+    mean_value: Optional[float]
+    last_value: Optional[float]
+
+    class Config:
+        from_attributes = True
+
+
+class SensorAggregateResponse(BaseModel):
+    """
+    센서 이력 구간 집계 응답 모델.
+    """
+    device_id: str
+    metric: str
+    granularity: str
+    start: datetime
+    end: datetime
+    points: List[SensorAggregatePoint] = []
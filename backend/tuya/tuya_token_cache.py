@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from starlette.config import Config
+
+from database import SessionLocal
+from tuya.tuya_utility import fetch_and_save_token, get_tuya_config_by_user_id, is_token_expired, run_tuya_call
+
+config = Config('.env')
+TUYA_TOKEN_REFRESH_MARGIN = config('TUYA_TOKEN_REFRESH_MARGIN', cast=int, default=300)
+
+
+class TuyaTokenCache:
+    """
+    사용자별 Tuya 토큰을 메모리에 보관하는 캐시.
+    만료 margin 초 전부터 갱신하며, 같은 사용자에 대한 동시 요청은 하나의 갱신 결과를 공유한다 (single-flight).
+    """
+    def __init__(self, margin: int):
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._tokens: Dict[int, dict] = {}
+        # invalidate 마다 증가. 이전 generation 에서 시작한 _load 의 결과는 저장하지 않는다
+        self._generations: Dict[int, int] = {}
+        self._inflight: Dict[int, Tuple[int, asyncio.Task]] = {}
+
+    async def get(self, user_id: int) -> Tuple[Optional[dict], bool]:
+        """
+        Return (token, refreshed) for the user. token is None when the user has no Tuya configuration.
+        """
+        while True:
+            with self._lock:
+                token = self._tokens.get(user_id)
+                generation = self._generations.get(user_id, 0)
+            if token and token["refresh_at"] > time.time():
+                return token, False
+
+            inflight = self._inflight.get(user_id)
+            if inflight is None or inflight[0] != generation:
+                task = asyncio.ensure_future(run_tuya_call(self._load, user_id, generation))
+                inflight = self._inflight[user_id] = (generation, task)
+                task.add_done_callback(lambda done: self._forget(user_id, done))
+            # 먼저 들어온 요청이 취소되어도 갱신은 끝까지 진행되어 다른 대기자에게 전달되도록 shield
+            token, refreshed = await asyncio.shield(inflight[1])
+            # 기다리는 동안 설정이 바뀌었으면 새 설정으로 다시 조회
+            if self._generations.get(user_id, 0) == generation:
+                return token, refreshed
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._tokens.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self._inflight.pop(user_id, None)
+
+    def _forget(self, user_id: int, task: asyncio.Task):
+        inflight = self._inflight.get(user_id)
+        if inflight is not None and inflight[1] is task:
+            del self._inflight[user_id]
+
+    def _load(self, user_id: int, generation: int) -> Tuple[Optional[dict], bool]:
+        with SessionLocal() as db:
+            tuya_config = get_tuya_config_by_user_id(db, user_id)
+            if not tuya_config:
+                return None, False
+            refreshed = False
+            # 다른 워커가 이미 갱신해 두었으면 DB 의 토큰을 그대로 사용
+            if is_token_expired(tuya_config, margin=self.margin):
+                fetch_and_save_token(tuya_config, db, user_id)
+                refreshed = True
+            token = {
+                "access_token": tuya_config.access_token,
+                "refresh_token": tuya_config.refresh_token,
+                "expire_time": tuya_config.expire_time,
+                "refresh_at": tuya_config.create_date.timestamp() + tuya_config.expire_time - self.margin,
+            }
+        with self._lock:
+            if self._generations.get(user_id, 0) == generation:
+                self._tokens[user_id] = token
+        return token, refreshed
+
+
+tuya_token_cache = TuyaTokenCache(TUYA_TOKEN_REFRESH_MARGIN)
@@ -72,18 +72,87 @@
 #     """
 #     return db.query(TuyaInfo).filter(TuyaInfo.user_id == user_id).first()
 
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+from urllib.parse import urlsplit
+
 from fastapi import HTTPException
 from tuya_connector import TuyaOpenAPI
+from tuya_connector.openapi import TuyaTokenInfo
 from sqlalchemy.orm import Session
+from starlette.config import Config
 from datetime import datetime, timedelta
+import metrics
+from cache import TTLCache
 from models import TuyaInfo
 
+config = Config('.env')
+TUYA_MAX_WORKERS = config('TUYA_MAX_WORKERS', cast=int, default=8)
+TUYA_REQUEST_TIMEOUT = config('TUYA_REQUEST_TIMEOUT', cast=float, default=15.0)
+TUYA_CLIENT_POOL_SIZE = config('TUYA_CLIENT_POOL_SIZE', cast=int, default=256)
+TUYA_CLIENT_IDLE_SECONDS = config('TUYA_CLIENT_IDLE_SECONDS', cast=float, default=600.0)
+
+# 동기 Tuya SDK 호출 전용 스레드 풀. 느린 Tuya 응답이 다른 요청의 스레드까지 점유하지 않도록 크기를 제한.
+tuya_executor = ThreadPoolExecutor(max_workers=TUYA_MAX_WORKERS, thread_name_prefix="tuya")
+
+
+async def run_tuya_call(func, *args):
+    """
+    Run a blocking Tuya SDK call on the bounded Tuya executor without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(tuya_executor, functools.partial(func, *args)),
+            timeout=TUYA_REQUEST_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tuya cloud request timed out.")
+
+
+def _timed_request(request, method, url, *args, **kwargs):
+    """
+    Call requests.Session.request and record the latency / error in metrics by endpoint path.
+    """
+    started = time.perf_counter()
+    failed = True
+    try:
+        response = request(method, url, *args, **kwargs)
+        failed = response.status_code >= 400
+        return response
+    finally:
+        metrics.observe_upstream("tuya", method.upper(), urlsplit(url).path,
+                                 time.perf_counter() - started, failed)
+
 
 def initialize_openapi(tuya_config: TuyaInfo) -> TuyaOpenAPI:
     """
     Initialize TuyaOpenAPI with the given configuration.
     """
-    return TuyaOpenAPI(tuya_config.api_endpoint, tuya_config.access_id, tuya_config.access_key)
+    openapi = TuyaOpenAPI(tuya_config.api_endpoint, tuya_config.access_id, tuya_config.access_key)
+    # SDK 는 timeout 없이 요청하므로, 멈춘 연결이 executor 스레드를 붙잡지 않도록 기본 timeout 지정
+    openapi.session.request = functools.partial(
+        _timed_request, functools.partial(openapi.session.request, timeout=TUYA_REQUEST_TIMEOUT))
+    return openapi
+
+
+def apply_tuya_token(tuya_config: TuyaInfo, token_data: dict):
+    """
+    Copy the token data onto TuyaInfo without committing.
+    """
+    tuya_config.user_id = token_data["user_id"]
+    tuya_config.access_token = token_data["access_token"]
+    tuya_config.refresh_token = token_data["refresh_token"]
+    tuya_config.expire_time = token_data["expire_time"]
+    tuya_config.uid = token_data.get('uid')
+    tuya_config.t = token_data.get('t')
+    tuya_config.tid = token_data.get('tid')
+    tuya_config.create_date = datetime.now()
 
 
 def update_tuya_token(tuya_config: TuyaInfo, token_data: dict, db: Session):
@@ -91,14 +160,7 @@ def update_tuya_token(tuya_config: TuyaInfo, token_data: dict, db: Session):
     Update the TuyaInfo token data in the database.
     """
     try:
-        tuya_config.user_id = token_data["user_id"]
-        tuya_config.access_token = token_data["access_token"]
-        tuya_config.refresh_token = token_data["refresh_token"]
-        tuya_config.expire_time = token_data["expire_time"]
-        tuya_config.uid = token_data.get('uid')
-        tuya_config.t = token_data.get('t')
-        tuya_config.tid = token_data.get('tid')
-        tuya_config.create_date = datetime.now()
+        apply_tuya_token(tuya_config, token_data)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -108,36 +170,47 @@ def update_tuya_token(tuya_config: TuyaInfo, token_data: dict, db: Session):
         )
 
 
-def fetch_and_save_token(tuya_config: TuyaInfo, db: Session, user_id: int) -> dict:
+def request_tuya_token(tuya_config: TuyaInfo) -> dict:
     """
-    Fetch a new token from Tuya API and save it to the database.
+    Request a new token from Tuya API.
     """
     openapi = initialize_openapi(tuya_config)
     try:
         response = openapi.connect()
-        if response.get("success"):
-            token_data = response["result"]
-            token_data["user_id"] = user_id
-            update_tuya_token(tuya_config, token_data, db)
-            return token_data
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Failed to fetch token: {response.get('msg', 'Unknown error')}"
-            )
     except Exception as e:
+        metrics.token_refreshes.inc("tuya", "error")
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching token: {str(e)}"
         )
+    if not response or not response.get("success"):
+        metrics.token_refreshes.inc("tuya", "error")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to fetch token: {(response or {}).get('msg', 'Unknown error')}"
+        )
+    metrics.token_refreshes.inc("tuya", "success")
+    return response["result"]
+
+
+def fetch_and_save_token(tuya_config: TuyaInfo, db: Session, user_id: int) -> dict:
+    """
+    Fetch a new token from Tuya API and save it to the database.
+    """
+    token_data = request_tuya_token(tuya_config)
+    token_data["user_id"] = user_id
+    update_tuya_token(tuya_config, token_data, db)
+    # 풀에 남은 이전 토큰의 클라이언트는 새 토큰으로 다시 만들도록 제거
+    client_pool.invalidate(user_id)
+    return token_data
 
-def is_token_expired(tuya_config: TuyaInfo) -> bool:
+def is_token_expired(tuya_config: TuyaInfo, margin: int = 0) -> bool:
     """
-    Check if the Tuya token is expired.
+    Check if the Tuya token is expired, or expires within `margin` seconds.
     """
     if not tuya_config.access_token:
         return True
-    expiration_time = tuya_config.create_date + timedelta(seconds=tuya_config.expire_time)
+    expiration_time = tuya_config.create_date + timedelta(seconds=tuya_config.expire_time - margin)
     return datetime.now() >= expiration_time
 
 
@@ -147,3 +220,101 @@ def get_tuya_config_by_user_id(db: Session, user_id: int) -> TuyaInfo:
     """
     return db.query(TuyaInfo).filter(TuyaInfo.user_id == user_id).first()
 
+
+def save_tuya_config(db: Session, user_id: int, access_id: str, access_key: str, api_endpoint: str) -> TuyaInfo:
+    """
+    Create or update the Tuya configuration of the given user.
+    """
+    tuya_config = get_tuya_config_by_user_id(db, user_id)
+    if not tuya_config:
+        # Tuya 설정이 없으면 새로 생성
+        tuya_config = TuyaInfo(user_id=user_id)
+        db.add(tuya_config)
+    # 기존 설정 업데이트
+    tuya_config.access_id = access_id
+    tuya_config.access_key = access_key
+    tuya_config.api_endpoint = api_endpoint
+    db.commit()
+    db.refresh(tuya_config)
+    client_pool.invalidate(user_id)
+    return tuya_config
+
+
+def fetch_device_list(tuya_config: TuyaInfo, page_size: int) -> dict:
+    """
+    Fetch the device list of the given configuration from Tuya cloud.
+    """
+    with client_pool.client(tuya_config) as openapi:
+        return openapi.get(f"/v2.0/cloud/thing/device?page_size={page_size}")
+
+
+def token_info_from_config(tuya_config: TuyaInfo) -> TuyaTokenInfo:
+    """
+    Build the SDK token info from the token stored in TuyaInfo.
+    """
+    return TuyaTokenInfo({
+        "t": int(tuya_config.create_date.timestamp() * 1000),
+        "result": {
+            "access_token": tuya_config.access_token,
+            "refresh_token": tuya_config.refresh_token,
+            "expire_time": tuya_config.expire_time,
+            "uid": tuya_config.uid,
+        },
+    })
+
+
+class PooledClient(NamedTuple):
+    openapi: TuyaOpenAPI
+    lock: threading.Lock
+
+
+class TuyaClientPool:
+    """
+    사용자/access_id 별로 연결된 TuyaOpenAPI 를 재사용하는 LRU/TTL 풀.
+    클라이언트는 requests.Session 의 keep-alive 연결과 DB 에 저장된 토큰을 그대로 사용한다.
+    SDK 는 요청 중에 token_info 를 비우고 다시 채우므로(토큰 갱신, 1010 재시도),
+    같은 클라이언트는 client() 의 lock 으로 한 번에 한 스레드만 사용한다.
+    """
+    def __init__(self, maxsize: int, idle_seconds: float):
+        self._clients = TTLCache(maxsize, idle_seconds, sliding=True, on_evict=self._close)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def client(self, tuya_config: TuyaInfo) -> Iterator[TuyaOpenAPI]:
+        """
+        Yield the connected client of the configuration while holding its lock.
+        Keep the block to the Tuya calls themselves so other threads are not held up.
+        """
+        key = (tuya_config.user_id, tuya_config.access_id)
+        with self._lock:
+            pooled = self._clients.get(key)
+            if (
+                pooled is None
+                or pooled.openapi.access_secret != tuya_config.access_key
+                or pooled.openapi.endpoint != tuya_config.api_endpoint
+            ):
+                openapi = initialize_openapi(tuya_config)
+                if tuya_config.create_date and tuya_config.expire_time and not is_token_expired(tuya_config):
+                    openapi.token_info = token_info_from_config(tuya_config)
+                pooled = PooledClient(openapi, threading.Lock())
+                self._clients.set(key, pooled)
+        with pooled.lock:
+            if not pooled.openapi.is_connect():
+                response = pooled.openapi.connect()
+                if not response or not response.get("success"):
+                    self._clients.pop(key)
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Failed to connect to Tuya: {(response or {}).get('msg', 'Unknown error')}"
+                    )
+            yield pooled.openapi
+
+    def invalidate(self, user_id: int):
+        self._clients.discard_where(lambda key: key[0] == user_id)
+
+    @staticmethod
+    def _close(key, pooled: PooledClient):
+        pooled.openapi.session.close()
+
+
+client_pool = TuyaClientPool(TUYA_CLIENT_POOL_SIZE, TUYA_CLIENT_IDLE_SECONDS)
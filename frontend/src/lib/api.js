@@ -21,6 +21,7 @@ const fastapi = (operation, url, params, success_callback, failure_callback) =>
 
     let options = {
         method: method,
+        credentials: 'include',  // read replica 사용 시 last_write cookie 를 주고받기 위해
         headers: {
             "Content-Type": content_type
         }